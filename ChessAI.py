@@ -2,94 +2,404 @@
 Handling the AI moves.
 """
 import random
+import time
+from array import array
 
-piece_score = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "p": 1}
-
-knight_scores = [[0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0],
-                 [0.1, 0.3, 0.5, 0.5, 0.5, 0.5, 0.3, 0.1],
-                 [0.2, 0.5, 0.6, 0.65, 0.65, 0.6, 0.5, 0.2],
-                 [0.2, 0.55, 0.65, 0.7, 0.7, 0.65, 0.55, 0.2],
-                 [0.2, 0.5, 0.65, 0.7, 0.7, 0.65, 0.5, 0.2],
-                 [0.2, 0.55, 0.6, 0.65, 0.65, 0.6, 0.55, 0.2],
-                 [0.1, 0.3, 0.5, 0.55, 0.55, 0.5, 0.3, 0.1],
-                 [0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0]]
-
-bishop_scores = [[0.0, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.0],
-                 [0.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.2],
-                 [0.2, 0.4, 0.5, 0.6, 0.6, 0.5, 0.4, 0.2],
-                 [0.2, 0.5, 0.5, 0.6, 0.6, 0.5, 0.5, 0.2],
-                 [0.2, 0.4, 0.6, 0.6, 0.6, 0.6, 0.4, 0.2],
-                 [0.2, 0.6, 0.6, 0.6, 0.6, 0.6, 0.6, 0.2],
-                 [0.2, 0.5, 0.4, 0.4, 0.4, 0.4, 0.5, 0.2],
-                 [0.0, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.0]]
-
-rook_scores = [[0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25],
-               [0.5, 0.75, 0.75, 0.75, 0.75, 0.75, 0.75, 0.5],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.25, 0.25, 0.25, 0.5, 0.5, 0.25, 0.25, 0.25]]
-
-queen_scores = [[0.0, 0.2, 0.2, 0.3, 0.3, 0.2, 0.2, 0.0],
-                [0.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.2],
-                [0.2, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.2],
-                [0.3, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.3],
-                [0.4, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.3],
-                [0.2, 0.5, 0.5, 0.5, 0.5, 0.5, 0.4, 0.2],
-                [0.2, 0.4, 0.5, 0.4, 0.4, 0.4, 0.4, 0.2],
-                [0.0, 0.2, 0.2, 0.3, 0.3, 0.2, 0.2, 0.0]]
-
-pawn_scores = [[0.8, 0.8, 0.8, 0.8, 0.8, 0.8, 0.8, 0.8],
-               [0.7, 0.7, 0.7, 0.7, 0.7, 0.7, 0.7, 0.7],
-               [0.3, 0.3, 0.4, 0.5, 0.5, 0.4, 0.3, 0.3],
-               [0.25, 0.25, 0.3, 0.45, 0.45, 0.3, 0.25, 0.25],
-               [0.2, 0.2, 0.2, 0.4, 0.4, 0.2, 0.2, 0.2],
-               [0.25, 0.15, 0.1, 0.2, 0.2, 0.1, 0.15, 0.25],
-               [0.25, 0.3, 0.3, 0.0, 0.0, 0.3, 0.3, 0.25],
-               [0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2]]
-
-piece_position_scores = {"wN": knight_scores,
-                         "bN": knight_scores[::-1],
-                         "wB": bishop_scores,
-                         "bB": bishop_scores[::-1],
-                         "wQ": queen_scores,
-                         "bQ": queen_scores[::-1],
-                         "wR": rook_scores,
-                         "bR": rook_scores[::-1],
-                         "wp": pawn_scores,
-                         "bp": pawn_scores[::-1]}
+from ChessEngine import piece_score
 
 CHECKMATE = 1000
 STALEMATE = 0
-DEPTH = 3
+DRAW = 0  # repetition or fifty-move rule
+TIME_LIMIT = 3  # seconds the AI may spend on a move
+MAX_DEPTH = 32  # iterative deepening stops here even if there is time left
+THREADS = 1  # processes a search is split over, more than one searches with ChessParallel
+TT_SIZE_MB = 16  # memory given to the transposition table
+MOVE_ORDERING = True  # only switched off to measure what the ordering saves
+QUIESCENCE = True  # search captures past the horizon, only switched off to measure what it costs
+DELTA_MARGIN = 2  # a capture has to be able to raise the score to within this many pawns of alpha
+NULL_MOVE_PRUNING = True  # a position still good after passing the turn is cut off with a shallower search
+NULL_MOVE_REDUCTION = 2  # extra plies the search after the null move is reduced by
+LATE_MOVE_REDUCTIONS = True  # quiet moves ordered late are searched less deep first
+LMR_FULL_DEPTH_MOVES = 3  # moves searched to full depth at every node before reducing the rest
+LMR_MIN_DEPTH = 3  # no reductions closer to the horizon than this
+LMR_LATE_MOVES = 8  # moves after this many are reduced by two plies instead of one
+MAX_PLY = 64
 
+# bound types stored in the transposition table
+EXACT = 0
+LOWER_BOUND = 1  # search failed high, the real score is at least the stored one
+UPPER_BOUND = 2  # search failed low, the real score is at most the stored one
 
-def findBestMove(game_state, valid_moves, return_queue):
-    global next_move
-    next_move = None
-    random.shuffle(valid_moves)
-    findMoveNegaMaxAlphaBeta(game_state, valid_moves, DEPTH, -CHECKMATE, CHECKMATE,
-                             1 if game_state.white_to_move else -1)
-    return_queue.put(next_move)
+
+class TranspositionTable:
+    """
+    Fixed size table of search results indexed by GameState.zobrist_key.
+    Every bucket has two slots: the first one keeps the deepest result of the current search (depth-preferred),
+    the second one is always overwritten, so new results still get stored when the first slot is taken.
+    Fields are kept in flat typed arrays, that way the table really takes the given number of megabytes.
+    """
+    ENTRY_SIZE = 8 + 8 + 4 + 1 + 1 + 1  # key, score, move, depth, bound and age in bytes
+
+    def __init__(self, size_mb=TT_SIZE_MB):
+        self.size_mb = size_mb
+        self.bucket_count = max(1, size_mb * 1024 * 1024 // (2 * self.ENTRY_SIZE))
+        slots = 2 * self.bucket_count
+        self.keys = array("Q", bytes(8 * slots))
+        self.scores = array("d", bytes(8 * slots))
+        self.moves = array("i", bytes(4 * slots))  # moveID of the best move, 0 if there is none
+        self.depths = array("b", bytes(slots))
+        self.bounds = array("b", bytes(slots))
+        self.ages = array("B", bytes(slots))
+        self.age = 0
+
+    def newSearch(self):
+        """
+        Entries from earlier searches can be replaced even if they are deeper.
+        """
+        self.age = (self.age + 1) % 256
+
+    def clear(self):
+        self.__init__(self.size_mb)
+
+    def probe(self, key):
+        """
+        Returns (depth, score, bound, move_id) stored for the position, or None.
+        """
+        slot = 2 * (key % self.bucket_count)
+        if self.keys[slot] != key:
+            slot += 1
+            if self.keys[slot] != key:
+                return None
+        return self.depths[slot], self.scores[slot], self.bounds[slot], self.moves[slot]
+
+    def store(self, key, depth, score, bound, move_id):
+        slot = 2 * (key % self.bucket_count)
+        if self.keys[slot] != key and self.depths[slot] > depth and self.ages[slot] == self.age:
+            slot += 1  # keep the deeper result, use the always-replace slot
+        self.keys[slot] = key
+        self.scores[slot] = score
+        self.moves[slot] = move_id
+        self.depths[slot] = depth
+        self.bounds[slot] = bound
+        self.ages[slot] = self.age
+
+
+transposition_table = TranspositionTable()
+
+# move ordering: the hash move first, then captures by MVV-LVA (most valuable victim, least valuable attacker),
+# then the two killer moves of the ply, then the rest of the quiet moves by their history score
+HASH_MOVE_SCORE = 1000000
+CAPTURE_SCORE = 100000
+KILLER_SCORES = (90000, 80000)
+mvv_lva_values = {"p": 1, "N": 3, "B": 3, "R": 5, "Q": 9, "K": 10}
+killer_moves = [[0, 0] for _ in range(MAX_PLY)]  # moveIDs of two quiet moves that caused a cutoff at each ply
+NO_KILLERS = (0, 0)  # no killers, for quiescence and root ordering
+history_table = {}  # moveID -> bonus for every cutoff the quiet move caused
+
+
+def resetMoveOrdering():
+    for killers in killer_moves:
+        killers[0] = killers[1] = 0
+    history_table.clear()
+
+
+def scoreMove(move, hash_move_id, killers):
+    if move.moveID == hash_move_id:
+        return HASH_MOVE_SCORE
+    if move.is_capture:
+        return CAPTURE_SCORE + 10 * mvv_lva_values[move.piece_captured[1]] - mvv_lva_values[move.piece_moved[1]]
+    if move.is_pawn_promotion:
+        return CAPTURE_SCORE if move.promotion_piece == "Q" else 0  # under-promotions are hardly ever best
+    if move.moveID == killers[0]:
+        return KILLER_SCORES[0]
+    if move.moveID == killers[1]:
+        return KILLER_SCORES[1]
+    return history_table.get(move.moveID, 0)
+
+
+def orderMoves(valid_moves, hash_move_id, ply):
+    """
+    Sort the moves so the ones most likely to cause a cutoff are searched first.
+    The sort is stable, moves with the same score keep their order.
+    """
+    killers = killer_moves[ply]
+    valid_moves.sort(key=lambda move: scoreMove(move, hash_move_id, killers), reverse=True)
+
+
+def updateMoveOrdering(move, depth, ply):
+    """
+    Remember a quiet move that caused a beta cutoff.
+    """
+    if move.is_capture or move.is_pawn_promotion:
+        return  # captures are already ordered by MVV-LVA
+    killers = killer_moves[ply]
+    if killers[0] != move.moveID:
+        killers[1] = killers[0]
+        killers[0] = move.moveID
+    history_table[move.moveID] = min(history_table.get(move.moveID, 0) + depth * depth, KILLER_SCORES[1] - 1)
+
+
+# principal variation search: after the first move every move is searched with a null window around alpha,
+# only to prove it is no better. Scores are multiples of 0.05, so no score falls strictly inside the null window.
+NULL_WINDOW = 0.01
+ASPIRATION_WINDOW = 0.5  # the root first searches this far either side of the previous iteration's score
+
+# search state, shared by the functions below during one findBestMove call
+nodes_searched = 0  # positions visited by the last search
+search_depth = 0  # depth of the iteration that is running
+search_start_time = 0.0
+search_deadline = float("inf")
+search_node_limit = float("inf")
+search_aborted = False  # set once the budget runs out, every node then returns straight away
+pv_lines = [[] for _ in range(MAX_PLY + 2)]  # pv_lines[ply]: best line found from the node at ply
 
 
-def findMoveNegaMaxAlphaBeta(game_state, valid_moves, depth, alpha, beta, turn_multiplier):
-    global next_move
+def findBestMove(game_state, valid_moves, return_queue, time_limit=TIME_LIMIT, max_depth=MAX_DEPTH,
+                 node_limit=None, report=None):
+    """
+    Iterative deepening: search to depth 1, 2, 3... until the time (in seconds) or node budget runs out.
+    Every iteration first searches a narrow aspiration window around the score of the one before, and widens it
+    when the score falls outside.
+    The best move of the last completed iteration is put on the queue, its principal variation (the line both sides
+    are expected to play) is returned.
+    The first iteration always completes, so there is a move to play even with a tiny budget.
+    After every iteration report(depth, score, nodes, seconds, principal variation) is called if it is given.
+    """
+    start_time = startSearch(time_limit, node_limit)
+    random.shuffle(valid_moves)  # equally ordered moves are still picked at random
+    best_move = None
+    principal_variation = []
+    score = 0
+    for depth in range(1, min(max_depth, MAX_PLY) + 1):
+        window = ASPIRATION_WINDOW
+        if depth > 1 and abs(score) < CHECKMATE:
+            alpha, beta = max(score - window, -CHECKMATE), min(score + window, CHECKMATE)
+        else:
+            alpha, beta = -CHECKMATE, CHECKMATE
+        while True:
+            score, line = searchRoot(game_state, valid_moves, depth, alpha, beta)
+            if search_aborted:
+                break
+            window *= 2
+            if score <= alpha and alpha > -CHECKMATE:  # failed low, the real score is lower
+                alpha = max(alpha - window, -CHECKMATE)
+            elif score >= beta and beta < CHECKMATE:  # failed high, the real score is higher
+                beta = min(beta + window, CHECKMATE)
+            else:
+                break
+        if search_aborted:
+            break
+        principal_variation = line
+        best_move = principal_variation[0] if principal_variation else None  # None when there is no move
+        if report is not None:
+            report(depth, score, nodes_searched, time.time() - start_time, principal_variation)
+        if abs(score) == CHECKMATE or len(valid_moves) <= 1:
+            break  # a forced mate, for either side, or a forced move: searching deeper won't change anything
+        if time.time() - start_time > (search_deadline - start_time) / 2:
+            break  # the next iteration would not finish in the time left
+    return_queue.put(best_move)
+    return principal_variation
+
+
+def startSearch(time_limit, node_limit=None):
+    """
+    Reset the search state for a new search with this budget, returns the time it started.
+    """
+    global nodes_searched, search_start_time, search_deadline, search_node_limit, search_aborted
+    nodes_searched = 0
+    search_aborted = False
+    start_time = search_start_time = time.time()
+    search_deadline = start_time + time_limit if time_limit is not None else float("inf")
+    search_node_limit = node_limit if node_limit is not None else float("inf")
+    transposition_table.newSearch()
+    resetMoveOrdering()
+    return start_time
+
+
+def searchRoot(game_state, moves, depth, alpha=-CHECKMATE, beta=CHECKMATE):
+    """
+    One iteration of the search over the given root moves, returns the score and the principal variation.
+    """
+    global search_depth
+    search_depth = depth
+    pv_lines[0] = []
+    turn_multiplier = 1 if game_state.white_to_move else -1
+    score = findMoveNegaMaxAlphaBeta(game_state, depth, alpha, beta, turn_multiplier, moves)
+    return score, extendLine(game_state, pv_lines[0], depth)
+
+
+def extendLine(game_state, line, length):
+    """
+    A transposition table cutoff ends the principal variation early, continue it with the hash moves.
+    """
+    line = list(line)
+    for move in line:
+        game_state.makeMove(move)
+    while 0 < len(line) < length:
+        entry = transposition_table.probe(game_state.zobrist_key)
+        move = None
+        if entry is not None and entry[3] != 0:
+            move = next((move for move in game_state.getValidMoves() if move.moveID == entry[3]), None)
+        if move is None:
+            break
+        line.append(move)
+        game_state.makeMove(move)
+    for _ in line:
+        game_state.undoMove()
+    return line
+
+
+def stopSearch(deadline=0):
+    """
+    Make a search running in another thread finish at the deadline (a time.time() value), right away by default.
+    """
+    global search_deadline
+    search_deadline = deadline
+
+
+def findMoveNegaMaxAlphaBeta(game_state, depth, alpha, beta, turn_multiplier, valid_moves=None, ply=0):
+    """
+    Negamax with alpha-beta pruning and principal variation search, the best line from the node is left in
+    pv_lines[ply]. The root searches the valid_moves it is given, every other node generates its moves stage by stage
+    while it searches them, so a cutoff saves generating the rest.
+    Null-move pruning and late move reductions search parts of the tree less deep, ply is the distance from the root.
+    Checkmate and stalemate are only found when a node runs out of moves, leaves never generate all their moves.
+    """
+    global nodes_searched, search_aborted
+    if depth == 0 and QUIESCENCE:
+        return quiescenceSearch(game_state, alpha, beta, turn_multiplier)
+    nodes_searched += 1
+    if search_depth > 1 and (nodes_searched >= search_node_limit or time.time() >= search_deadline):
+        search_aborted = True
+        return 0
     if depth == 0:
+        if game_state.inCheck() and len(game_state.getValidMoves()) == 0:
+            return -CHECKMATE  # only a check can make a leaf worse than its score, a stalemate is missed
         return turn_multiplier * scoreBoard(game_state)
-    # move ordering - implement later //TODO
+    alpha_original = alpha
+    if ply > 0 and (game_state.halfmove_clock >= 100 or game_state.getRepetitionCount() >= 1):
+        return DRAW  # a position that was seen before can be repeated again and again, so it is a draw
+    hash_move_id = 0
+    entry = transposition_table.probe(game_state.zobrist_key)
+    if entry is not None:
+        hash_move_id = entry[3]
+        if entry[0] >= depth and ply > 0:  # the root always has to search, it has to find the best line
+            entry_score, entry_bound = entry[1], entry[2]
+            if entry_bound == EXACT:
+                return entry_score
+            elif entry_bound == LOWER_BOUND:
+                alpha = max(alpha, entry_score)
+            else:
+                beta = min(beta, entry_score)
+            if alpha >= beta:
+                return entry_score
+    in_check = game_state.inCheck()
+    if (NULL_MOVE_PRUNING and ply > 0 and depth > NULL_MOVE_REDUCTION and not in_check and beta < CHECKMATE
+            and game_state.undo_stack[-1][0] is not None and game_state.hasNonPawnMaterial()
+            and turn_multiplier * scoreBoard(game_state) >= beta):
+        # zugzwang, where passing would be best, is rare unless only pawns are left, and never happens in check
+        game_state.makeNullMove()
+        score = -findMoveNegaMaxAlphaBeta(game_state, depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + NULL_WINDOW,
+                                          -turn_multiplier, ply=ply + 1)
+        game_state.undoNullMove()
+        if search_aborted:
+            return 0
+        if score >= beta:
+            return beta  # not the score itself, a mate found after passing is no proof of anything
+    killers = killer_moves[ply]
+    if valid_moves is not None:
+        if MOVE_ORDERING:
+            orderMoves(valid_moves, hash_move_id, ply)
+        moves = valid_moves
+    elif MOVE_ORDERING:
+        moves = game_state.getMovesInStages(hash_move_id, killers,
+                                            lambda move: scoreMove(move, hash_move_id, killers))
+    else:
+        moves = game_state.getMovesInStages()
     max_score = -CHECKMATE
-    for move in valid_moves:
+    best_move_id = 0
+    moves_searched = 0
+    for move in moves:
         game_state.makeMove(move)
-        next_moves = game_state.getValidMoves()
-        score = -findMoveNegaMaxAlphaBeta(game_state, next_moves, depth - 1, -beta, -alpha, -turn_multiplier)
-        if score > max_score:
+        pv_lines[ply + 1] = []
+        if moves_searched == 0:  # the first move is expected to be the best one, it gets the full window
+            score = -findMoveNegaMaxAlphaBeta(game_state, depth - 1, -beta, -alpha, -turn_multiplier, ply=ply + 1)
+        else:
+            reduction = 0
+            if (LATE_MOVE_REDUCTIONS and depth >= LMR_MIN_DEPTH and moves_searched >= LMR_FULL_DEPTH_MOVES
+                    and not in_check and not move.is_capture and not move.is_pawn_promotion
+                    and move.moveID not in killers and not game_state.inCheck()):
+                reduction = 2 if moves_searched >= LMR_LATE_MOVES and depth > LMR_MIN_DEPTH else 1
+            score = -findMoveNegaMaxAlphaBeta(game_state, depth - 1 - reduction, -alpha - NULL_WINDOW, -alpha,
+                                              -turn_multiplier, ply=ply + 1)
+            if reduction and score > alpha and not search_aborted:  # the reduced search may have missed something
+                score = -findMoveNegaMaxAlphaBeta(game_state, depth - 1, -alpha - NULL_WINDOW, -alpha,
+                                                  -turn_multiplier, ply=ply + 1)
+            if alpha < score < beta and not search_aborted:  # it is better after all, search again for its score
+                score = -findMoveNegaMaxAlphaBeta(game_state, depth - 1, -beta, -alpha, -turn_multiplier,
+                                                  ply=ply + 1)
+        game_state.undoMove()
+        moves_searched += 1
+        if search_aborted:
+            return 0  # the result of an unfinished search is worthless, don't store or use it
+        if score > max_score or moves_searched == 1:  # the first move is kept even when it is mated
             max_score = score
-            if depth == DEPTH:
-                next_move = move
+            best_move_id = move.moveID
+            if score > alpha or ply == 0:  # the root always keeps a move, even when they all lose
+                pv_lines[ply] = [move] + pv_lines[ply + 1]
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if MOVE_ORDERING:
+                    updateMoveOrdering(move, depth, ply)
+                break
+    if moves_searched == 0:  # the game is over in this position
+        return -CHECKMATE if in_check else STALEMATE
+    if max_score <= alpha_original:
+        bound = UPPER_BOUND
+    elif max_score >= beta:
+        bound = LOWER_BOUND
+    else:
+        bound = EXACT
+    transposition_table.store(game_state.zobrist_key, depth, max_score, bound, best_move_id)
+    return max_score
+
+
+def quiescenceSearch(game_state, alpha, beta, turn_multiplier):
+    """
+    Search only captures and promotions past the horizon, until the position is quiet.
+    That way an exchange is never scored half way through.
+    """
+    global nodes_searched, search_aborted
+    nodes_searched += 1
+    if search_depth > 1 and (nodes_searched >= search_node_limit or time.time() >= search_deadline):
+        search_aborted = True
+        return 0
+    moves = game_state.getCaptureMoves()  # all the evasions when in check, none of them means checkmate
+    in_check = game_state.in_check
+    if in_check:
+        if len(moves) == 0:
+            return -CHECKMATE
+        stand_pat = max_score = -CHECKMATE  # no standing pat when in check, the check has to be answered
+    else:
+        # stand pat: the side to move doesn't have to capture, so the static score is a lower bound
+        stand_pat = max_score = turn_multiplier * scoreBoard(game_state)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+    moves.sort(key=lambda move: scoreMove(move, 0, NO_KILLERS), reverse=True)
+    for move in moves:
+        if not in_check and not move.is_pawn_promotion and stand_pat + piece_score[
+                move.piece_captured[1]] + DELTA_MARGIN <= alpha:
+            continue  # delta pruning: even winning the piece for free can't get the score up to alpha
+        game_state.makeMove(move)
+        score = -quiescenceSearch(game_state, -beta, -alpha, -turn_multiplier)
         game_state.undoMove()
+        if search_aborted:
+            return 0
+        if score > max_score:
+            max_score = score
         if max_score > alpha:
             alpha = max_score
         if alpha >= beta:
@@ -108,20 +418,7 @@ def scoreBoard(game_state):
             return CHECKMATE  # white wins
     elif game_state.stalemate:
         return STALEMATE
-    score = 0
-    for row in range(len(game_state.board)):
-        for col in range(len(game_state.board[row])):
-            piece = game_state.board[row][col]
-            if piece != "--":
-                piece_position_score = 0
-                if piece[1] != "K":
-                    piece_position_score = piece_position_scores[piece][row][col]
-                if piece[0] == "w":
-                    score += piece_score[piece[1]] + piece_position_score
-                if piece[0] == "b":
-                    score -= piece_score[piece[1]] + piece_position_score
-
-    return score
+    return game_state.board_score  # kept up to date by makeMove and undoMove
 
 
 def findRandomMove(valid_moves):
@@ -0,0 +1,241 @@
+"""
+Headless benchmarks for the engine and the AI, run from the command line:
+python ChessBench.py movegen|ordering|quiescence|pruning|tactics|threads|uci
+"""
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from queue import Empty, Queue
+
+import ChessEngine
+import ChessAI
+import ChessParallel
+
+BENCH_SEEDS = (1, 2, 3)  # every seed plays its own random opening
+BENCH_OPENING_PLIES = 8
+PRUNING_SETTINGS = ("NULL_MOVE_PRUNING", "LATE_MOVE_REDUCTIONS")
+
+# positions with one clearly best move in UCI notation: forks, skewers, short mates and a back rank defence.
+# Pruning must not make the search miss any of them.
+TACTICS = (
+    ("r3k3/8/8/3N4/8/8/8/4K3 w - - 0 1", "d5c7"),
+    ("8/1q6/8/3k4/8/8/8/4KB2 w - - 0 1", "f1g2"),
+    ("r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 1", "d5f6"),
+    ("4k3/8/8/8/q7/8/4B3/4R1K1 w - - 0 1", "e2b5"),
+    ("6k1/5ppp/4p3/8/8/4N3/5PPP/3r2K1 w - - 0 1", "e3d1"),
+    ("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4", "h5f7"),
+    ("6k1/pp3ppp/8/3n4/8/8/PP3PPP/2R3K1 w - - 0 1", "c1c8"),
+    ("3q2k1/5ppp/8/8/8/8/5PPP/3QR1K1 w - - 0 1", "d1d8"),
+    ("4r1k1/5ppp/8/8/8/2n5/5PPP/2R3K1 b - - 0 1", "c3e2"),
+    ("r1b2k1r/ppp1bppp/8/1B1Q4/5q2/2P5/PPP2PPP/R3R1K1 w - - 1 1", "d5d8"),
+)
+TACTICS_DEPTH = 5
+THREADS_DEPTH = 5
+UCI_TIMEOUT = 30  # seconds the UCI check waits for an answer
+
+
+def benchPositions():
+    """
+    Play a few reproducible random openings, the position after each one is used for benchmarking.
+    """
+    positions = []
+    for seed in BENCH_SEEDS:
+        rng = random.Random(seed)
+        game_state = ChessEngine.GameState()
+        for _ in range(BENCH_OPENING_PLIES):
+            game_state.makeMove(rng.choice(game_state.getValidMoves()))
+        positions.append(game_state)
+    return positions
+
+
+def searchPosition(game_state, depth):
+    """
+    Run a fixed depth search, returns the number of nodes and the time it took.
+    """
+    ChessAI.transposition_table.clear()
+    random.seed(0)
+    start = time.time()
+    ChessAI.findBestMove(game_state, game_state.getValidMoves(), Queue(), time_limit=None, max_depth=depth)
+    return ChessAI.nodes_searched, time.time() - start
+
+
+def benchMoveGeneration(repeats=200):
+    """
+    Throughput of the move generators on the benchmark positions.
+    """
+    positions = benchPositions()
+    for name in ("getAllPossibleMoves", "getValidMoves", "getCaptureMoves"):
+        generated = 0
+        start = time.time()
+        for _ in range(repeats):
+            for game_state in positions:
+                generated += len(getattr(game_state, name)())
+        elapsed = time.time() - start
+        print(f"{name:<20} {repeats * len(positions) / elapsed:8.0f} calls/s {generated / elapsed:9.0f} moves/s")
+
+
+def compareSetting(setting, depths):
+    """
+    Node counts of fixed depth searches with a ChessAI on/off setting switched off and on.
+    """
+    default = getattr(ChessAI, setting)
+    positions = benchPositions()
+    print(f"{setting}\ndepth  position              off                on    saved")
+    for depth in depths:
+        for i, game_state in enumerate(positions):
+            results = []
+            for value in (False, True):
+                setattr(ChessAI, setting, value)
+                results.append(searchPosition(game_state, depth))
+            (off_nodes, off_time), (on_nodes, on_time) = results
+            print(f"{depth:>5}  {i + 1:>8}  {off_nodes:>9} {off_time:6.1f}s  "
+                  f"{on_nodes:>9} {on_time:6.1f}s  {1 - on_nodes / off_nodes:6.1%}")
+    setattr(ChessAI, setting, default)
+
+
+def setPruning(value):
+    for setting in PRUNING_SETTINGS:
+        setattr(ChessAI, setting, value)
+
+
+def comparePruning(depths=(3, 4, 5)):
+    """
+    Nodes, time and effective branching factor (nodes of a depth / nodes of the depth before) of fixed depth
+    searches with null-move pruning and late move reductions off and on.
+    """
+    positions = benchPositions()
+    print("pruning  depth      nodes    time    EBF")
+    for value in (False, True):
+        setPruning(value)
+        previous_nodes = None
+        for depth in depths:
+            results = [searchPosition(game_state, depth) for game_state in positions]
+            nodes = sum(result[0] for result in results)
+            elapsed = sum(result[1] for result in results)
+            branching = f"{nodes / previous_nodes:6.2f}" if previous_nodes else "     -"
+            print(f"{'on' if value else 'off':>7}  {depth:>5}  {nodes:>9} {elapsed:6.2f}s {branching}")
+            previous_nodes = nodes
+    setPruning(True)
+
+
+def solveTactics(depth=TACTICS_DEPTH):
+    """
+    Search every tactics position to a fixed depth, returns the number solved and the nodes it took.
+    """
+    solved = nodes = 0
+    for fen, best_move in TACTICS:
+        game_state = ChessEngine.GameState(fen)
+        ChessAI.transposition_table.clear()
+        random.seed(0)
+        return_queue = Queue()
+        ChessAI.findBestMove(game_state, game_state.getValidMoves(), return_queue, time_limit=None, max_depth=depth)
+        move = return_queue.get()
+        nodes += ChessAI.nodes_searched
+        if move is not None and move.getUciNotation() == best_move:
+            solved += 1
+        else:
+            print(f"missed {best_move} in {fen}")
+    return solved, nodes
+
+
+def compareTactics():
+    for value in (False, True):
+        setPruning(value)
+        solved, nodes = solveTactics()
+        print(f"pruning {'on' if value else 'off':<3}  {solved}/{len(TACTICS)} solved  {nodes:>9} nodes")
+    setPruning(True)
+
+
+def compareThreads(depth=THREADS_DEPTH):
+    """
+    Time to depth with the search split over 1, 2, ... processes, up to one per core.
+    """
+    positions = benchPositions()
+    print("threads      nodes    time  speedup")
+    single_time = None
+    for threads in range(1, max(os.cpu_count() or 1, 2) + 1):
+        # a short search first, so starting the processes isn't timed
+        ChessParallel.findBestMove(positions[0], positions[0].getValidMoves(), Queue(), None, 1, threads=threads)
+        nodes = 0
+        start = time.time()
+        for game_state in positions:
+            ChessParallel.newGame()
+            random.seed(0)
+            ChessParallel.findBestMove(game_state, game_state.getValidMoves(), Queue(), time_limit=None,
+                                       max_depth=depth, threads=threads)
+            nodes += ChessParallel.nodes_searched
+        elapsed = time.time() - start
+        single_time = single_time or elapsed
+        print(f"{threads:>7}  {nodes:>9} {elapsed:6.2f}s  {single_time / elapsed:6.2f}x")
+
+
+def checkUci(threads=2):
+    """
+    Drive ChessUCI.py through a pipe the way a GUI does, with the search split over threads processes: the main
+    thread of the engine reads stdin while the search runs. Every go must answer with a bestmove.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ChessUCI.py")
+    engine = subprocess.Popen([sys.executable, script], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                              bufsize=1)
+    lines = Queue()
+    threading.Thread(target=lambda: [lines.put(line.strip()) for line in engine.stdout], daemon=True).start()
+
+    def send(*commands):
+        for command in commands:
+            engine.stdin.write(command + "\n")
+        engine.stdin.flush()
+
+    def expect(prefix):
+        deadline = time.time() + UCI_TIMEOUT
+        while True:
+            try:
+                line = lines.get(timeout=max(deadline - time.time(), 0))
+            except Empty:
+                return None
+            if line.startswith(prefix):
+                return line
+
+    failures = 0
+    send("uci", f"setoption name Threads value {threads}", "isready")
+    checks = (("go depth 3", ()), ("go movetime 500", ()), ("go infinite", ("stop",)))
+    if expect("readyok") is None:
+        print("no readyok")
+        failures += 1
+        checks = ()
+    for go, after in checks:
+        send("ucinewgame", "position startpos moves e2e4", go)
+        time.sleep(0.5)  # the search is running while the engine waits for the next line
+        send(*after)
+        start = time.time()
+        answer = expect("bestmove")
+        print(f"{go:<16} {answer or 'no answer'}  {time.time() - start:.2f}s")
+        failures += answer is None
+    if failures:
+        engine.kill()  # a hung engine doesn't read quit
+    else:
+        send("quit")
+    engine.wait()
+    print(f"{failures} failed" if failures else "all searches answered")
+    return failures
+
+
+def compareMoveOrdering():
+    compareSetting("MOVE_ORDERING", (3, 4))
+
+
+def compareQuiescence():
+    compareSetting("QUIESCENCE", (2, 3))
+
+
+BENCHMARKS = {"movegen": benchMoveGeneration, "ordering": compareMoveOrdering, "quiescence": compareQuiescence,
+              "pruning": comparePruning, "tactics": compareTactics, "threads": compareThreads,
+              "uci": checkUci}
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in BENCHMARKS:
+        print("usage: python ChessBench.py " + "|".join(BENCHMARKS))
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]]()
@@ -0,0 +1,181 @@
+"""
+Opening book in a Polyglot-style binary file: 16-byte entries of position key (64 bits), moveID (16 bits), weight
+(16 bits) and 32 unused learn bits, big-endian and sorted by key. The key is GameState.zobrist_key, so a book only
+works with the zobrist numbers of ChessEngine, not with Polyglot books of other engines.
+The file is memory-mapped and searched with a binary search, opening it reads nothing and a lookup touches a few pages.
+Build a book from games:
+python ChessBook.py build book.bin games.pgn [more.pgn ...] [--plies N] [--min-weight N]
+"""
+import argparse
+import itertools
+import mmap
+import os
+import random
+import re
+import struct
+from collections import defaultdict
+
+import ChessEngine
+
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+BOOK_ENTRY = struct.Struct(">QHHI")  # key, moveID, weight, learn
+BOOK_PLIES = 20  # only the first moves of the games go into the book
+MAX_WEIGHT = 0xFFFF
+
+# comments, variations, numeric annotations, move numbers and results are skipped when reading the moves
+PGN_NOISE = re.compile(r"\{[^}]*\}|;[^\n]*|\$\d+|\d+\.(\.\.)?|1-0|0-1|1/2-1/2|\*")
+
+opening_books = {}  # path -> OpeningBook, None if there is no book at that path
+
+
+class OpeningBook:
+    """
+    A book file opened for lookups.
+    """
+
+    def __init__(self, path):
+        self.book_file = open(path, "rb")
+        size = os.fstat(self.book_file.fileno()).st_size
+        self.entries = size // BOOK_ENTRY.size
+        # an empty file can't be mapped, it simply has no entries
+        self.data = mmap.mmap(self.book_file.fileno(), 0, access=mmap.ACCESS_READ) if self.entries else b""
+
+    def findMoves(self, key):
+        """
+        The (moveID, weight) entries of the position key, binary search for the first entry with that key.
+        """
+        low, high = 0, self.entries
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from(">Q", self.data, middle * BOOK_ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        for index in range(low, self.entries):
+            entry_key, move_id, weight, _ = BOOK_ENTRY.unpack_from(self.data, index * BOOK_ENTRY.size)
+            if entry_key != key:
+                break
+            moves.append((move_id, weight))
+        return moves
+
+    def chooseMove(self, game_state, rng=random):
+        """
+        A book move for the position picked at random in proportion to the weights, None if the position is not in
+        the book. Entries that aren't valid moves (a key collision) are skipped.
+        """
+        entries = [(move_id, weight) for move_id, weight in self.findMoves(game_state.zobrist_key) if weight > 0]
+        if not entries:
+            return None
+        valid_moves = {move.moveID: move for move in game_state.getValidMoves()}
+        entries = [(move_id, weight) for move_id, weight in entries if move_id in valid_moves]
+        if not entries:
+            return None
+        pick = rng.randrange(sum(weight for _, weight in entries))
+        for move_id, weight in entries:
+            pick -= weight
+            if pick < 0:
+                return valid_moves[move_id]
+
+    def close(self):
+        if self.entries:
+            self.data.close()
+        self.book_file.close()
+
+
+def bookMove(game_state, path=BOOK_FILE):
+    """
+    A move from the book at path for the position, None if there is none or no book. The book stays open.
+    """
+    if path not in opening_books:
+        opening_books[path] = OpeningBook(path) if os.path.exists(path) else None
+    book = opening_books[path]
+    return book.chooseMove(game_state) if book is not None else None
+
+
+def readPgnGames(path):
+    """
+    Yields the games of a PGN file as (FEN of the start position or None, result, list of SAN moves).
+    """
+    tags = {}
+    movetext = []
+    with open(path, errors="replace") as pgn_file:
+        for line in itertools.chain(pgn_file, ["[Event"]):  # the extra tag line ends the last game
+            if line.startswith("["):
+                if movetext:
+                    yield tags.get("FEN"), tags.get("Result", "*"), parseMovetext(" ".join(movetext))
+                    movetext = []
+                    tags = {}
+                name, _, value = line[1:].partition(" ")
+                tags[name] = value.strip().rstrip("]").strip('"')
+            elif not line.startswith("%"):
+                movetext.append(line.strip())
+
+
+def parseMovetext(movetext):
+    """
+    The SAN moves of a game's movetext, without the variations in parentheses.
+    """
+    main_line = ""
+    depth = 0
+    for char in PGN_NOISE.sub(" ", movetext):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0:
+            main_line += char
+    return main_line.split()
+
+
+def findSanMove(game_state, san, valid_moves):
+    """
+    The valid move written as san, None if there is none. Check marks and annotations like ! and ? don't matter.
+    """
+    san = san.rstrip("+#!?").replace("0-0-0", "O-O-O").replace("0-0", "O-O")
+    for move in valid_moves:
+        if game_state.getSanNotation(move, valid_moves).rstrip("+#") == san:
+            return move
+    return None
+
+
+def buildBook(pgn_paths, book_path, plies=BOOK_PLIES, min_weight=1):
+    """
+    Count the moves played in the first plies of the games and write the book. A move gets 2 points for every game
+    won by the side that played it and 1 for every draw, the same weights Polyglot uses, lost games count nothing.
+    Returns the number of games read and the number of entries written.
+    """
+    weights = defaultdict(int)  # (key, moveID) -> weight
+    game_count = 0
+    for pgn_path in pgn_paths:
+        for fen, result, san_moves in readPgnGames(pgn_path):
+            game_count += 1
+            game_state = ChessEngine.GameState(fen)
+            for san in san_moves[:plies]:
+                valid_moves = game_state.getValidMoves()
+                move = findSanMove(game_state, san, valid_moves)
+                if move is None:
+                    print(f"{pgn_path}: game {game_count}: can't play {san}, the rest of the game is skipped")
+                    break
+                won = "1-0" if game_state.white_to_move else "0-1"
+                points = 2 if result == won else 1 if result == "1/2-1/2" else 0
+                weights[game_state.zobrist_key, move.moveID] += points
+                game_state.makeMove(move)
+    entries = sorted((key, move_id, min(weight, MAX_WEIGHT)) for (key, move_id), weight in weights.items()
+                     if weight >= min_weight)
+    with open(book_path, "wb") as book_file:
+        for key, move_id, weight in entries:
+            book_file.write(BOOK_ENTRY.pack(key, move_id, weight, 0))
+    return game_count, len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an opening book from PGN files.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("book")
+    parser.add_argument("pgn", nargs="+")
+    parser.add_argument("--plies", type=int, default=BOOK_PLIES, help="moves of each game that go into the book")
+    parser.add_argument("--min-weight", type=int, default=1, help="leave out moves with a smaller weight")
+    arguments = parser.parse_args()
+    games, entries = buildBook(arguments.pgn, arguments.book, arguments.plies, arguments.min_weight)
+    print(f"{games} games, {entries} entries written to {arguments.book}")
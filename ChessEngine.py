@@ -3,15 +3,206 @@ Storing all the information about the current state of chess game.
 Determining valid moves at current state.
 It will keep move log.
 """
+import random
+
+# Zobrist hashing: one random 64-bit number for every piece on every square, plus numbers for
+# black to move, each of the 16 castling rights combinations and each en-passant file.
+# The generator is seeded so a position gets the same key in every process and every run.
+zobrist_random = random.Random(20240601)
+zobrist_pieces = {piece: [zobrist_random.getrandbits(64) for _ in range(64)]
+                  for piece in ("wp", "wR", "wN", "wB", "wQ", "wK", "bp", "bR", "bN", "bB", "bQ", "bK")}
+zobrist_black_to_move = zobrist_random.getrandbits(64)
+zobrist_castling = [zobrist_random.getrandbits(64) for _ in range(16)]
+zobrist_enpassant = [zobrist_random.getrandbits(64) for _ in range(8)]
+
+# Castling rights: one bit for each castling move that is still allowed, the 4-bit number indexes zobrist_castling.
+CASTLE_WKS = 1  # white king-side
+CASTLE_BKS = 2
+CASTLE_WQS = 4  # white queen-side
+CASTLE_BQS = 8
+ALL_CASTLING_RIGHTS = CASTLE_WKS | CASTLE_BKS | CASTLE_WQS | CASTLE_BQS
+# CASTLING_RIGHTS_KEPT[row * 8 + col]: the rights left after a move from or to the square. A king or rook leaving
+# its starting square, or a rook being captured on it, loses the rights that need that piece.
+CASTLING_RIGHTS_KEPT = [ALL_CASTLING_RIGHTS] * 64
+CASTLING_RIGHTS_KEPT[7 * 8 + 4] = CASTLE_BKS | CASTLE_BQS  # white king
+CASTLING_RIGHTS_KEPT[7 * 8 + 7] = ALL_CASTLING_RIGHTS & ~CASTLE_WKS
+CASTLING_RIGHTS_KEPT[7 * 8 + 0] = ALL_CASTLING_RIGHTS & ~CASTLE_WQS
+CASTLING_RIGHTS_KEPT[0 * 8 + 4] = CASTLE_WKS | CASTLE_WQS  # black king
+CASTLING_RIGHTS_KEPT[0 * 8 + 7] = ALL_CASTLING_RIGHTS & ~CASTLE_BKS
+CASTLING_RIGHTS_KEPT[0 * 8 + 0] = ALL_CASTLING_RIGHTS & ~CASTLE_BQS
+
+# Bitboards: a 64-bit int with bit (row * 8 + col) set for every square that holds a piece of the set.
+FULL_BOARD = (1 << 64) - 1
+COL_A = sum(1 << (row * 8) for row in range(8))
+ROW_1 = 0xFF << 56
+ROW_8 = 0xFF
+# squares that can still be reached after moving d_col columns, indexed by d_col + 2
+COL_SHIFT_MASKS = [FULL_BOARD & ~(COL_A * 0b11000000), FULL_BOARD & ~(COL_A * 0b10000000), FULL_BOARD,
+                   FULL_BOARD & ~COL_A, FULL_BOARD & ~(COL_A * 0b11)]
+
+
+def directionShift(d_row, d_col):
+    """
+    Shifts that move every square of a bitboard d_row rows and d_col columns (at most 2):
+    ((bitboard << left) >> right) & mask, the mask drops squares that would wrap around to the other side.
+    """
+    shift = d_row * 8 + d_col
+    return max(shift, 0), max(-shift, 0), COL_SHIFT_MASKS[d_col + 2]
+
+
+ROOK_DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))  # up, left, down, right
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, 1), (1, -1))  # diagonals: up/left up/right down/right down/left
+ROOK_SHIFTS = tuple(directionShift(d_row, d_col) for d_row, d_col in ROOK_DIRECTIONS)
+BISHOP_SHIFTS = tuple(directionShift(d_row, d_col) for d_row, d_col in BISHOP_DIRECTIONS)
+KNIGHT_SHIFTS = tuple(directionShift(d_row, d_col) for d_row, d_col in (
+    (-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2)))
+KING_SHIFTS = ROOK_SHIFTS + BISHOP_SHIFTS
+# a step forward, a capture to the left and a capture to the right for the pawns of each color
+PAWN_SHIFTS = {"w": (directionShift(-1, 0), directionShift(-1, -1), directionShift(-1, 1)),
+               "b": (directionShift(1, 0), directionShift(1, -1), directionShift(1, 1))}
+
+
+def slidingAttacks(bitboard, occupied, shifts):
+    """
+    Squares a slider on the bitboard reaches in the given directions, every ray stops at the first occupied square.
+    """
+    attacks = 0
+    for left, right, mask in shifts:
+        ray = ((bitboard << left) >> right) & mask
+        while ray:
+            attacks |= ray
+            if ray & occupied:
+                break
+            ray = ((ray << left) >> right) & mask
+    return attacks
+
+
+def stepAttacks(bitboard, shifts):
+    """
+    Squares one step away from the bitboard in each of the given directions.
+    """
+    attacks = 0
+    for left, right, mask in shifts:
+        attacks |= ((bitboard << left) >> right) & mask
+    return attacks
+
+
+# Attack tables, indexed by square (row * 8 + col): the squares a piece standing there attacks.
+KNIGHT_ATTACKS = [stepAttacks(1 << square, KNIGHT_SHIFTS) for square in range(64)]
+KING_ATTACKS = [stepAttacks(1 << square, KING_SHIFTS) for square in range(64)]
+PAWN_ATTACKS = {color: [stepAttacks(1 << square, PAWN_SHIFTS[color][1:]) for square in range(64)] for color in "wb"}
+# RAYS[direction][square]: the squares from square to the edge of the board in one of the 8 RAY_DIRECTIONS,
+# the rook directions first (indexes 0-3), then the bishop ones (4-7). direction ^ 2 is the opposite direction.
+RAY_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+RAYS = [[slidingAttacks(1 << square, 0, (shift,)) for square in range(64)] for shift in ROOK_SHIFTS + BISHOP_SHIFTS]
+ROOK_RAYS = (0, 1, 2, 3)
+BISHOP_RAYS = (4, 5, 6, 7)
+# directions in which the square numbers go up, the first piece on those rays is the lowest bit
+RAY_INCREASING = [d_row * 8 + d_col > 0 for d_row, d_col in RAY_DIRECTIONS]
+
+
+def rayAttacks(square, occupied, directions):
+    """
+    Squares a slider on square reaches in the given RAYS directions, every ray stops at the first occupied square.
+    """
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            if RAY_INCREASING[direction]:
+                blocker_square = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker_square = blockers.bit_length() - 1
+            ray ^= RAYS[direction][blocker_square]  # cut off the squares behind the blocker
+        attacks |= ray
+    return attacks
+
+
+def firstSquareOnRay(pieces, direction):
+    """
+    Square of the piece closest to the start of a ray, pieces holds the pieces on a RAYS[direction] ray.
+    """
+    if RAY_INCREASING[direction]:
+        return (pieces & -pieces).bit_length() - 1
+    return pieces.bit_length() - 1
+
+
+# Evaluation: the material value of every piece type, and a bonus for every square
+# (from white's point of view, the tables are mirrored for black)
+piece_score = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "p": 1}
+
+knight_scores = [[0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0],
+                 [0.1, 0.3, 0.5, 0.5, 0.5, 0.5, 0.3, 0.1],
+                 [0.2, 0.5, 0.6, 0.65, 0.65, 0.6, 0.5, 0.2],
+                 [0.2, 0.55, 0.65, 0.7, 0.7, 0.65, 0.55, 0.2],
+                 [0.2, 0.5, 0.65, 0.7, 0.7, 0.65, 0.5, 0.2],
+                 [0.2, 0.55, 0.6, 0.65, 0.65, 0.6, 0.55, 0.2],
+                 [0.1, 0.3, 0.5, 0.55, 0.55, 0.5, 0.3, 0.1],
+                 [0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0]]
+
+bishop_scores = [[0.0, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.0],
+                 [0.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.2],
+                 [0.2, 0.4, 0.5, 0.6, 0.6, 0.5, 0.4, 0.2],
+                 [0.2, 0.5, 0.5, 0.6, 0.6, 0.5, 0.5, 0.2],
+                 [0.2, 0.4, 0.6, 0.6, 0.6, 0.6, 0.4, 0.2],
+                 [0.2, 0.6, 0.6, 0.6, 0.6, 0.6, 0.6, 0.2],
+                 [0.2, 0.5, 0.4, 0.4, 0.4, 0.4, 0.5, 0.2],
+                 [0.0, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.0]]
+
+rook_scores = [[0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25],
+               [0.5, 0.75, 0.75, 0.75, 0.75, 0.75, 0.75, 0.5],
+               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
+               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
+               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
+               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
+               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
+               [0.25, 0.25, 0.25, 0.5, 0.5, 0.25, 0.25, 0.25]]
+
+queen_scores = [[0.0, 0.2, 0.2, 0.3, 0.3, 0.2, 0.2, 0.0],
+                [0.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.2],
+                [0.2, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.2],
+                [0.3, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.3],
+                [0.4, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.3],
+                [0.2, 0.5, 0.5, 0.5, 0.5, 0.5, 0.4, 0.2],
+                [0.2, 0.4, 0.5, 0.4, 0.4, 0.4, 0.4, 0.2],
+                [0.0, 0.2, 0.2, 0.3, 0.3, 0.2, 0.2, 0.0]]
+
+pawn_scores = [[0.8, 0.8, 0.8, 0.8, 0.8, 0.8, 0.8, 0.8],
+               [0.7, 0.7, 0.7, 0.7, 0.7, 0.7, 0.7, 0.7],
+               [0.3, 0.3, 0.4, 0.5, 0.5, 0.4, 0.3, 0.3],
+               [0.25, 0.25, 0.3, 0.45, 0.45, 0.3, 0.25, 0.25],
+               [0.2, 0.2, 0.2, 0.4, 0.4, 0.2, 0.2, 0.2],
+               [0.25, 0.15, 0.1, 0.2, 0.2, 0.1, 0.15, 0.25],
+               [0.25, 0.3, 0.3, 0.0, 0.0, 0.3, 0.3, 0.25],
+               [0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2]]
+
+piece_position_scores = {"wN": knight_scores,
+                         "bN": knight_scores[::-1],
+                         "wB": bishop_scores,
+                         "bB": bishop_scores[::-1],
+                         "wQ": queen_scores,
+                         "bQ": queen_scores[::-1],
+                         "wR": rook_scores,
+                         "bR": rook_scores[::-1],
+                         "wp": pawn_scores,
+                         "bp": pawn_scores[::-1]}
+
+# material plus square bonus of every piece on every square, positive for white pieces and negative for black ones
+piece_square_values = {piece: [(1 if piece[0] == "w" else -1) * (
+        piece_score[piece[1]] + (piece_position_scores[piece][row][col] if piece[1] != "K" else 0))
+                               for row in range(8) for col in range(8)] for piece in zobrist_pieces}
 
 
 class GameState:
-    def __init__(self):
+    def __init__(self, fen=None):
         """
         Board is an 8x8 2d list, each element in list has 2 characters.
         The first character represents the color of the piece: 'b' or 'w'.
         The second character represents the type of the piece: 'R', 'N', 'B', 'Q', 'K' or 'p'.
         "--" represents an empty space with no piece.
+        The same position is also kept as bitboards (see computeBitboards), the move generators work on those.
+        Any other position can be set up by passing its FEN string.
         """
         self.board = [
             ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
@@ -25,28 +216,201 @@ class GameState:
         self.moveFunctions = {"p": self.getPawnMoves, "R": self.getRookMoves, "N": self.getKnightMoves,
                               "B": self.getBishopMoves, "Q": self.getQueenMoves, "K": self.getKingMoves}
         self.white_to_move = True
-        self.move_log = []
         self.white_king_location = (7, 4)
         self.black_king_location = (0, 4)
         self.checkmate = False
         self.stalemate = False
+        self.draw = False  # by threefold repetition or by the fifty-move rule
         self.in_check = False
         self.pins = []
         self.checks = []
         self.enpassant_possible = ()  # coordinates for the square where en-passant capture is possible
-        self.enpassant_possible_log = [self.enpassant_possible]
-        self.current_castling_rights = CastleRights(True, True, True, True)
-        self.castle_rights_log = [CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
-                                               self.current_castling_rights.wqs, self.current_castling_rights.bqs)]
+        self.current_castling_rights = ALL_CASTLING_RIGHTS  # CASTLE_* bits of the castling moves still allowed
+        self.halfmove_clock = 0  # moves by both sides since the last capture or pawn move, for the fifty-move rule
+        self.start_ply = 0  # plies played before the first position, 0 is white's first move
+        self.zobrist_key = self.computeZobristKey()  # 64-bit position key, updated incrementally by makeMove
+        self.board_score = self.computeBoardScore()  # material and piece-square score, positive is good for white
+        # one record for every move made, all undoMove needs to take it back: (move, castling rights,
+        # en-passant square, zobrist key, board score, halfmove clock) of the position before the move.
+        # The zobrist keys double as the position history for finding repetitions.
+        self.undo_stack = []
+        self.piece_bitboards = {}  # "wp" -> bitboard of the white pawns, ...
+        self.color_bitboards = {}  # "w" -> bitboard of all the white pieces, "b" -> all the black pieces
+        self.computeBitboards()
+        if fen is not None:
+            self.loadFen(fen)
+
+    def loadFen(self, fen):
+        """
+        Set up the position of a FEN string: the pieces, the side to move, castling rights, the en-passant square and
+        the move counters, the counters may be missing (as in EPD). The move log starts over.
+        """
+        fields = fen.split()
+        self.board = []
+        for fen_row in fields[0].split("/"):
+            row = []
+            for char in fen_row:
+                if char.isdigit():
+                    row += ["--"] * int(char)
+                else:
+                    row.append(("w" if char.isupper() else "b") + ("p" if char in "Pp" else char.upper()))
+            self.board.append(row)
+        for row in range(8):
+            for col in range(8):
+                if self.board[row][col] == "wK":
+                    self.white_king_location = (row, col)
+                elif self.board[row][col] == "bK":
+                    self.black_king_location = (row, col)
+        self.white_to_move = fields[1] == "w"
+        self.current_castling_rights = 0
+        for char, castle_right in (("K", CASTLE_WKS), ("k", CASTLE_BKS), ("Q", CASTLE_WQS), ("q", CASTLE_BQS)):
+            if char in fields[2]:
+                self.current_castling_rights |= castle_right
+        if fields[3] == "-":
+            self.enpassant_possible = ()
+        else:
+            self.enpassant_possible = (Move.ranks_to_rows[fields[3][1]], Move.files_to_cols[fields[3][0]])
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        self.start_ply = 2 * (max(fullmove_number, 1) - 1) + (0 if self.white_to_move else 1)
+        self.undo_stack = []
+        self.checkmate = False
+        self.stalemate = False
+        self.draw = False
+        self.zobrist_key = self.computeZobristKey()
+        self.board_score = self.computeBoardScore()
+        self.computeBitboards()
+
+    def getFen(self):
+        """
+        The FEN string of the position, loadFen(getFen()) gives the same position back.
+        """
+        fen_rows = []
+        for row in self.board:
+            fen_row = ""
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty != 0:
+                    fen_row += str(empty)
+                    empty = 0
+                char = "P" if piece[1] == "p" else piece[1]
+                fen_row += char if piece[0] == "w" else char.lower()
+            fen_rows.append(fen_row + (str(empty) if empty != 0 else ""))
+        castling = "".join(char for char, castle_right in (("K", CASTLE_WKS), ("Q", CASTLE_WQS), ("k", CASTLE_BKS),
+                                                            ("q", CASTLE_BQS))
+                           if self.current_castling_rights & castle_right) or "-"
+        if self.enpassant_possible == ():
+            enpassant = "-"
+        else:
+            enpassant = Move.cols_to_files[self.enpassant_possible[1]] + Move.rows_to_ranks[self.enpassant_possible[0]]
+        return f"{'/'.join(fen_rows)} {'w' if self.white_to_move else 'b'} {castling} {enpassant} " \
+               f"{self.halfmove_clock} {self.fullmove_number}"
+
+    @property
+    def fullmove_number(self):
+        """
+        Starts at 1 and goes up after every black move.
+        """
+        return (self.start_ply + len(self.undo_stack)) // 2 + 1
+
+    @property
+    def move_log(self):
+        """
+        The moves made so far, oldest first.
+        """
+        return [record[0] for record in self.undo_stack]
+
+    def computeBoardScore(self):
+        """
+        Add up the piece_square_values of all the pieces.
+        Only needed to set up the first score, makeMove and undoMove keep it up to date afterwards.
+        """
+        score = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "--":
+                    score += piece_square_values[piece][row * 8 + col]
+        return score
+
+    def computeBitboards(self):
+        """
+        Build the bitboards from the board, makeMove and undoMove keep them up to date afterwards.
+        """
+        self.piece_bitboards = {piece: 0 for piece in zobrist_pieces}
+        self.color_bitboards = {"w": 0, "b": 0}
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "--":
+                    self.piece_bitboards[piece] |= 1 << (row * 8 + col)
+                    self.color_bitboards[piece[0]] |= 1 << (row * 8 + col)
+
+    def updateBitboards(self, move):
+        """
+        Flip the bits the move changes.
+        Flipping them a second time takes the move back, so undoMove uses this too.
+        """
+        ally_color = move.piece_moved[0]
+        start_bit = 1 << (move.start_row * 8 + move.start_col)
+        end_bit = 1 << (move.end_row * 8 + move.end_col)
+        self.piece_bitboards[move.piece_moved] ^= start_bit
+        piece_placed = ally_color + move.promotion_piece if move.is_pawn_promotion else move.piece_moved
+        self.piece_bitboards[piece_placed] ^= end_bit
+        self.color_bitboards[ally_color] ^= start_bit | end_bit
+        if move.piece_captured != "--":
+            captured_bit = 1 << (move.start_row * 8 + move.end_col) if move.is_enpassant_move else end_bit
+            self.piece_bitboards[move.piece_captured] ^= captured_bit
+            self.color_bitboards[move.piece_captured[0]] ^= captured_bit
+        if move.is_castle_move:
+            if move.end_col - move.start_col == 2:  # king-side, rook goes from the corner to the left of the king
+                rook_bits = 1 << (move.end_row * 8 + move.end_col + 1) | 1 << (move.end_row * 8 + move.end_col - 1)
+            else:  # queen-side
+                rook_bits = 1 << (move.end_row * 8 + move.end_col - 2) | 1 << (move.end_row * 8 + move.end_col + 1)
+            self.piece_bitboards[ally_color + "R"] ^= rook_bits
+            self.color_bitboards[ally_color] ^= rook_bits
+
+    def computeZobristKey(self):
+        """
+        Hash the whole position from scratch.
+        Only needed to set up the first key, makeMove and undoMove keep it up to date afterwards.
+        """
+        key = 0
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "--":
+                    key ^= zobrist_pieces[piece][row * 8 + col]
+        if not self.white_to_move:
+            key ^= zobrist_black_to_move
+        key ^= zobrist_castling[self.current_castling_rights]
+        if self.enpassant_possible != ():
+            key ^= zobrist_enpassant[self.enpassant_possible[1]]
+        return key
 
     def makeMove(self, move):
         """
-        Takes a Move as a parameter and executes it.
-        (this will not work for castling, pawn promotion and en-passant)
+        Takes a Move as a parameter and executes it, including castling, promotions and en-passant.
         """
+        self.undo_stack.append((move, self.current_castling_rights, self.enpassant_possible, self.zobrist_key,
+                                self.board_score, self.halfmove_clock))
+        if move.piece_moved[1] == "p" or move.is_capture:
+            self.halfmove_clock = 0  # the positions before can never come back
+        else:
+            self.halfmove_clock += 1
+        key = self.zobrist_key ^ zobrist_black_to_move
+        start_square = move.start_row * 8 + move.start_col
+        end_square = move.end_row * 8 + move.end_col
+        key ^= zobrist_pieces[move.piece_moved][start_square]
+        score = self.board_score - piece_square_values[move.piece_moved][start_square]
+        if move.piece_captured != "--" and not move.is_enpassant_move:
+            key ^= zobrist_pieces[move.piece_captured][end_square]
+            score -= piece_square_values[move.piece_captured][end_square]
         self.board[move.start_row][move.start_col] = "--"
         self.board[move.end_row][move.end_col] = move.piece_moved
-        self.move_log.append(move)  # log the move so we can undo it later
         self.white_to_move = not self.white_to_move  # switch players
         # update king's location if moved
         if move.piece_moved == "wK":
@@ -56,46 +420,57 @@ class GameState:
 
         # pawn promotion
         if move.is_pawn_promotion:
-            # if not is_AI:
-            #    promoted_piece = input("Promote to Q, R, B, or N:") #take this to UI later
-            #    self.board[move.end_row][move.end_col] = move.piece_moved[0] + promoted_piece
-            # else:
-            self.board[move.end_row][move.end_col] = move.piece_moved[0] + "Q"
+            self.board[move.end_row][move.end_col] = move.piece_moved[0] + move.promotion_piece
+        key ^= zobrist_pieces[self.board[move.end_row][move.end_col]][end_square]
+        score += piece_square_values[self.board[move.end_row][move.end_col]][end_square]
 
         # enpassant move
         if move.is_enpassant_move:
             self.board[move.start_row][move.end_col] = "--"  # capturing the pawn
+            key ^= zobrist_pieces[move.piece_captured][move.start_row * 8 + move.end_col]
+            score -= piece_square_values[move.piece_captured][move.start_row * 8 + move.end_col]
 
         # update enpassant_possible variable
+        if self.enpassant_possible != ():
+            key ^= zobrist_enpassant[self.enpassant_possible[1]]
         if move.piece_moved[1] == "p" and abs(move.start_row - move.end_row) == 2:  # only on 2 square pawn advance
             self.enpassant_possible = ((move.start_row + move.end_row) // 2, move.start_col)
+            key ^= zobrist_enpassant[move.start_col]
         else:
             self.enpassant_possible = ()
 
         # castle move
         if move.is_castle_move:
             if move.end_col - move.start_col == 2:  # king-side castle move
-                self.board[move.end_row][move.end_col - 1] = self.board[move.end_row][
-                    move.end_col + 1]  # moves the rook to its new square
-                self.board[move.end_row][move.end_col + 1] = '--'  # erase old rook
+                rook_start_col, rook_end_col = move.end_col + 1, move.end_col - 1
             else:  # queen-side castle move
-                self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][
-                    move.end_col - 2]  # moves the rook to its new square
-                self.board[move.end_row][move.end_col - 2] = '--'  # erase old rook
+                rook_start_col, rook_end_col = move.end_col - 2, move.end_col + 1
+            rook = self.board[move.end_row][rook_start_col]
+            self.board[move.end_row][rook_end_col] = rook  # moves the rook to its new square
+            self.board[move.end_row][rook_start_col] = '--'  # erase old rook
+            key ^= zobrist_pieces[rook][move.end_row * 8 + rook_start_col] ^ zobrist_pieces[rook][
+                move.end_row * 8 + rook_end_col]
+            score += piece_square_values[rook][move.end_row * 8 + rook_end_col] - piece_square_values[rook][
+                move.end_row * 8 + rook_start_col]
 
-        self.enpassant_possible_log.append(self.enpassant_possible)
+        # update castling rights - whenever a king or rook leaves its square or a rook is captured
+        castling_rights = self.current_castling_rights & CASTLING_RIGHTS_KEPT[start_square] & CASTLING_RIGHTS_KEPT[
+            end_square]
+        if castling_rights != self.current_castling_rights:
+            key ^= zobrist_castling[self.current_castling_rights] ^ zobrist_castling[castling_rights]
+            self.current_castling_rights = castling_rights
 
-        # update castling rights - whenever it is a rook or king move
-        self.updateCastleRights(move)
-        self.castle_rights_log.append(CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
-                                                   self.current_castling_rights.wqs, self.current_castling_rights.bqs))
+        self.zobrist_key = key
+        self.board_score = score
+        self.updateBitboards(move)
 
     def undoMove(self):
         """
         Undo the last move
         """
-        if len(self.move_log) != 0:  # make sure that there is a move to undo
-            move = self.move_log.pop()
+        if len(self.undo_stack) != 0:  # make sure that there is a move to undo
+            move, self.current_castling_rights, self.enpassant_possible, self.zobrist_key, self.board_score, \
+                self.halfmove_clock = self.undo_stack.pop()
             self.board[move.start_row][move.start_col] = move.piece_moved
             self.board[move.end_row][move.end_col] = move.piece_captured
             self.white_to_move = not self.white_to_move  # swap players
@@ -108,14 +483,6 @@ class GameState:
             if move.is_enpassant_move:
                 self.board[move.end_row][move.end_col] = "--"  # leave landing square blank
                 self.board[move.start_row][move.end_col] = move.piece_captured
-
-            self.enpassant_possible_log.pop()
-            self.enpassant_possible = self.enpassant_possible_log[-1]
-
-            # undo castle rights
-            self.castle_rights_log.pop()  # get rid of the new castle rights from the move we are undoing
-            self.current_castling_rights = self.castle_rights_log[
-                -1]  # set the current castle rights to the last one in the list
             # undo the castle move
             if move.is_castle_move:
                 if move.end_col - move.start_col == 2:  # king-side
@@ -124,87 +491,38 @@ class GameState:
                 else:  # queen-side
                     self.board[move.end_row][move.end_col - 2] = self.board[move.end_row][move.end_col + 1]
                     self.board[move.end_row][move.end_col + 1] = '--'
+            self.updateBitboards(move)
             self.checkmate = False
             self.stalemate = False
+            self.draw = False
 
-    def updateCastleRights(self, move):
-        """
-        Update the castle rights given the move
-        """
-        if move.piece_captured == "wR":
-            if move.end_col == 0:  # left rook
-                self.current_castling_rights.wqs = False
-            elif move.end_col == 7:  # right rook
-                self.current_castling_rights.wks = False
-        elif move.piece_captured == "bR":
-            if move.end_col == 0:  # left rook
-                self.current_castling_rights.bqs = False
-            elif move.end_col == 7:  # right rook
-                self.current_castling_rights.bks = False
-
-        if move.piece_moved == 'wK':
-            self.current_castling_rights.wqs = False
-            self.current_castling_rights.wks = False
-        elif move.piece_moved == 'bK':
-            self.current_castling_rights.bqs = False
-            self.current_castling_rights.bks = False
-        elif move.piece_moved == 'wR':
-            if move.start_row == 7:
-                if move.start_col == 0:  # left rook
-                    self.current_castling_rights.wqs = False
-                elif move.start_col == 7:  # right rook
-                    self.current_castling_rights.wks = False
-        elif move.piece_moved == 'bR':
-            if move.start_row == 0:
-                if move.start_col == 0:  # left rook
-                    self.current_castling_rights.bqs = False
-                elif move.start_col == 7:  # right rook
-                    self.current_castling_rights.bks = False
+    def makeNullMove(self):
+        """
+        Pass the turn without moving, used by the search to see whether a position is good even without a move.
+        Never legal in a game and must not be made when in check.
+        """
+        self.undo_stack.append((None, self.current_castling_rights, self.enpassant_possible, self.zobrist_key,
+                                self.board_score, self.halfmove_clock))
+        self.halfmove_clock = 0  # a repetition across a null move isn't a real one
+        self.zobrist_key ^= zobrist_black_to_move
+        if self.enpassant_possible != ():
+            self.zobrist_key ^= zobrist_enpassant[self.enpassant_possible[1]]
+            self.enpassant_possible = ()
+        self.white_to_move = not self.white_to_move
+
+    def undoNullMove(self):
+        _, self.current_castling_rights, self.enpassant_possible, self.zobrist_key, self.board_score, \
+            self.halfmove_clock = self.undo_stack.pop()
+        self.white_to_move = not self.white_to_move
 
     def getValidMoves(self):
         """
         All moves considering checks.
         """
-        temp_castle_rights = CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
-                                          self.current_castling_rights.wqs, self.current_castling_rights.bqs)
         # advanced algorithm
-        moves = []
         self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()
-
-        if self.white_to_move:
-            king_row = self.white_king_location[0]
-            king_col = self.white_king_location[1]
-        else:
-            king_row = self.black_king_location[0]
-            king_col = self.black_king_location[1]
         if self.in_check:
-            if len(self.checks) == 1:  # only 1 check, block the check or move the king
-                moves = self.getAllPossibleMoves()
-                # to block the check you must put a piece into one of the squares between the enemy piece and your king
-                check = self.checks[0]  # check information
-                check_row = check[0]
-                check_col = check[1]
-                piece_checking = self.board[check_row][check_col]
-                valid_squares = []  # squares that pieces can move to
-                # if knight, must capture the knight or move your king, other pieces can be blocked
-                if piece_checking[1] == "N":
-                    valid_squares = [(check_row, check_col)]
-                else:
-                    for i in range(1, 8):
-                        valid_square = (king_row + check[2] * i,
-                                        king_col + check[3] * i)  # check[2] and check[3] are the check directions
-                        valid_squares.append(valid_square)
-                        if valid_square[0] == check_row and valid_square[
-                            1] == check_col:  # once you get to piece and check
-                            break
-                # get rid of any moves that don't block check or move king
-                for i in range(len(moves) - 1, -1, -1):  # iterate through the list backwards when removing elements
-                    if moves[i].piece_moved[1] != "K":  # move doesn't move king so it must block or capture
-                        if not (moves[i].end_row,
-                                moves[i].end_col) in valid_squares:  # move doesn't block or capture piece
-                            moves.remove(moves[i])
-            else:  # double check, king has to move
-                self.getKingMoves(king_row, king_col, moves)
+            moves = self.getEvasionMoves()
         else:  # not in check - all moves are fine
             moves = self.getAllPossibleMoves()
             if self.white_to_move:
@@ -216,15 +534,26 @@ class GameState:
             if self.inCheck():
                 self.checkmate = True
             else:
-                # TODO stalemate on repeated moves
                 self.stalemate = True
         else:
             self.checkmate = False
             self.stalemate = False
+        self.draw = len(moves) != 0 and (self.halfmove_clock >= 100 or self.getRepetitionCount() >= 2)
 
-        self.current_castling_rights = temp_castle_rights
         return moves
 
+    def getRepetitionCount(self):
+        """
+        How many times the current position was on the board before.
+        Only the positions since the last capture or pawn move can be the same, and only every second one has the same
+        side to move, so at most halfmove_clock / 2 keys are compared. Both sides need 2 moves to get back to a position.
+        """
+        count = 0
+        for plies_ago in range(4, min(self.halfmove_clock, len(self.undo_stack)) + 1, 2):
+            if self.undo_stack[-plies_ago][3] == self.zobrist_key:
+                count += 1
+        return count
+
     def inCheck(self):
         """
         Determine if a current player is in check
@@ -234,301 +563,498 @@ class GameState:
         else:
             return self.squareUnderAttack(self.black_king_location[0], self.black_king_location[1])
 
+    def hasNonPawnMaterial(self):
+        """
+        Whether the player to move has anything besides the king and pawns.
+        """
+        ally_color = "w" if self.white_to_move else "b"
+        return self.color_bitboards[ally_color] != self.piece_bitboards[ally_color + "p"] | self.piece_bitboards[
+            ally_color + "K"]
+
     def squareUnderAttack(self, row, col):
         """
-        Determine if enemy can attack the square row col
+        Determine if enemy can attack the square row col.
+        Looks outward from the square: for enemy knights, kings and pawns on the squares they would attack it from,
+        and for the first piece along every ray being an enemy slider that moves that way.
         """
-        self.white_to_move = not self.white_to_move  # switch to opponent's point of view
-        opponents_moves = self.getAllPossibleMoves()
-        self.white_to_move = not self.white_to_move
-        for move in opponents_moves:
-            if move.end_row == row and move.end_col == col:  # square is under attack
-                return True
-        return False
+        square = row * 8 + col
+        ally_color, enemy_color = ("w", "b") if self.white_to_move else ("b", "w")
+        pieces = self.piece_bitboards
+        if KNIGHT_ATTACKS[square] & pieces[enemy_color + "N"] or KING_ATTACKS[square] & pieces[enemy_color + "K"] or \
+                PAWN_ATTACKS[ally_color][square] & pieces[enemy_color + "p"]:
+            return True
+        occupied = self.color_bitboards["w"] | self.color_bitboards["b"]
+        queens = pieces[enemy_color + "Q"]
+        rook_attackers = pieces[enemy_color + "R"] | queens
+        if rook_attackers and rayAttacks(square, occupied, ROOK_RAYS) & rook_attackers:
+            return True
+        bishop_attackers = pieces[enemy_color + "B"] | queens
+        return bool(bishop_attackers and rayAttacks(square, occupied, BISHOP_RAYS) & bishop_attackers)
 
-    def getAllPossibleMoves(self):
+    def getCaptureMoves(self):
+        """
+        Valid captures and promotions only, quiet moves are never created.
+        When in check all valid moves are returned instead, any of them can be the only way out of the check.
+        """
+        self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()
+        if self.in_check:
+            return self.getValidMoves()
+        return self.getAllPossibleMoves(captures_only=True)
+
+    def getMovesInStages(self, hash_move_id=0, killer_ids=(), sort_key=None):
+        """
+        Yield the valid moves one stage at a time: the hash move, the winning captures and queen promotions, the
+        killer moves, the losing captures (see isLosingCapture) and then the quiet moves. A stage is only generated
+        once the moves before it are used up, so when the search gets a cutoff early the later stages are never
+        generated at all.
+        sort_key orders the moves within a stage, highest first. When in check all the valid moves are one stage.
+        """
+        in_check, pins, checks = self.checkForPinsAndChecks()
+        if in_check:
+            moves = self.getValidMoves()
+            if sort_key is not None:
+                moves.sort(key=sort_key, reverse=True)
+            yield from moves
+            return
+        done_ids = set()  # moves yielded already
+        if hash_move_id:
+            self.in_check, self.pins, self.checks = in_check, pins, checks
+            hash_move = self.getValidMoveFromID(hash_move_id)
+            if hash_move is not None:
+                done_ids.add(hash_move_id)
+                yield hash_move
+        # the searches in between the stages check other positions, so every stage puts back this position's pins
+        self.in_check, self.pins, self.checks = in_check, pins, checks
+        captures = self.getAllPossibleMoves(captures_only=True)
+        if sort_key is not None:
+            captures.sort(key=sort_key, reverse=True)
+        losing_captures = [move for move in captures if move.is_capture and self.isLosingCapture(move)]
+        losing_ids = {move.moveID for move in losing_captures}
+        for move in captures:
+            if move.moveID not in done_ids and move.moveID not in losing_ids:
+                yield move
+        done_ids.update(move.moveID for move in captures)
+        for killer_id in killer_ids:
+            if killer_id and killer_id not in done_ids:
+                self.in_check, self.pins, self.checks = in_check, pins, checks
+                killer = self.getValidMoveFromID(killer_id)
+                if killer is not None and not killer.is_capture and killer.promotion_piece != "Q":
+                    done_ids.add(killer_id)
+                    yield killer
+        for move in losing_captures:
+            if move.moveID != hash_move_id:
+                yield move
+        self.in_check, self.pins, self.checks = in_check, pins, checks
+        quiet_moves = [move for move in self.getAllPossibleMoves() if move.moveID not in done_ids]
+        king_row, king_col = self.white_king_location if self.white_to_move else self.black_king_location
+        self.getCastleMoves(king_row, king_col, quiet_moves)
+        if sort_key is not None:
+            quiet_moves.sort(key=sort_key, reverse=True)
+        for move in quiet_moves:
+            if move.moveID not in done_ids:  # castle moves can be a killer
+                yield move
+
+    def isLosingCapture(self, move):
+        """
+        Cheap test for a capture that probably loses material: a piece takes a less valuable one on a square the
+        opponent defends. The exchange isn't played out, so it can be wrong either way.
+        """
+        if move.is_pawn_promotion or piece_score[move.piece_captured[1]] >= piece_score[move.piece_moved[1]]:
+            return False
+        return self.squareUnderAttack(move.end_row, move.end_col)
+
+    def getValidMoveFromID(self, move_id):
+        """
+        The valid move with that moveID, or None if it isn't valid here (hash and killer moves can come from other
+        positions). Only the moves of the piece on the start square are generated, the pins have to be up to date
+        and the side to move must not be in check.
+        """
+        start_square = move_id & 63
+        row, col = start_square >> 3, start_square & 7
+        piece = self.board[row][col]
+        if piece[0] != ("w" if self.white_to_move else "b"):
+            return None  # an empty square or an enemy piece
+        moves = []
+        if move_id >> 12 == MOVE_CASTLE:
+            if piece[1] == "K":
+                self.getCastleMoves(row, col, moves)
+        else:
+            self.moveFunctions[piece[1]](row, col, moves)
+        for move in moves:
+            if move.moveID == move_id:
+                return move
+        return None
+
+    def getSanNotation(self, move, valid_moves=None):
+        """
+        The move in standard algebraic notation as PGN uses it (Nbd7, exd6, e8=Q+, O-O#).
+        Pass the valid moves of the position if they are at hand, they are needed to tell apart two pieces that can
+        go to the same square.
+        """
+        if valid_moves is None:
+            valid_moves = self.getValidMoves()
+        if move.is_castle_move:
+            san = "O-O" if move.end_col == 6 else "O-O-O"
+        elif move.piece_moved[1] == "p":
+            san = move.cols_to_files[move.start_col] + "x" if move.is_capture else ""
+            san += move.getRankFile(move.end_row, move.end_col)
+            if move.is_pawn_promotion:
+                san += "=" + move.promotion_piece
+        else:
+            rivals = [other for other in valid_moves if other.piece_moved == move.piece_moved
+                      and (other.end_row, other.end_col) == (move.end_row, move.end_col)
+                      and (other.start_row, other.start_col) != (move.start_row, move.start_col)]
+            san = move.piece_moved[1]
+            if rivals:
+                if all(other.start_col != move.start_col for other in rivals):
+                    san += move.cols_to_files[move.start_col]
+                elif all(other.start_row != move.start_row for other in rivals):
+                    san += move.rows_to_ranks[move.start_row]
+                else:
+                    san += move.getRankFile(move.start_row, move.start_col)
+            san += ("x" if move.is_capture else "") + move.getRankFile(move.end_row, move.end_col)
+        self.makeMove(move)
+        if self.inCheck():
+            san += "+" if self.getValidMoves() else "#"
+        self.undoMove()
+        self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()  # getValidMoves changed them
+        return san
+
+    def perft(self, depth):
+        """
+        Count the positions depth moves ahead, the standard way to check the move generator against known numbers.
+        """
+        if depth == 0:
+            return 1
+        moves = self.getValidMoves()
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            self.makeMove(move)
+            nodes += self.perft(depth - 1)
+            self.undoMove()
+        return nodes
+
+    def divide(self, depth):
+        """
+        perft split up by the first move, as a dict {move in UCI notation: positions}.
+        Comparing it with another engine's numbers shows which move the generator gets wrong.
+        """
+        counts = {}
+        for move in self.getValidMoves():
+            self.makeMove(move)
+            counts[move.getUciNotation()] = self.perft(depth - 1)
+            self.undoMove()
+        return counts
+
+    def getAllPossibleMoves(self, captures_only=False):
         """
         All moves without considering checks.
+        Pawn moves are found for all the pawns at once by shifting their whole bitboard, the other pieces look up
+        the squares they attack in the attack tables. Pinned pieces are moved one by one along their pin.
         """
         moves = []
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                turn = self.board[row][col][0]
-                if (turn == "w" and self.white_to_move) or (turn == "b" and not self.white_to_move):
-                    piece = self.board[row][col][1]
-                    self.moveFunctions[piece](row, col, moves)  # calls appropriate move function based on piece type
+        ally_color = "w" if self.white_to_move else "b"
+        pieces = self.piece_bitboards
+        pinned = 0
+        for pin in self.pins:
+            piece = self.board[pin[0]][pin[1]]
+            if piece[0] == ally_color:  # skip pins left over from the other side
+                pinned |= 1 << (pin[0] * 8 + pin[1])
+                self.moveFunctions[piece[1]](pin[0], pin[1], moves, captures_only)
+        self.addUnpinnedMoves(pinned, moves, captures_only)
+        king = pieces[ally_color + "K"]
+        if king:
+            square = king.bit_length() - 1
+            self.getKingMoves(square >> 3, square & 7, moves, captures_only)
         return moves
 
+    def addUnpinnedMoves(self, pinned, moves, captures_only=False, check_mask=FULL_BOARD):
+        """
+        Add the moves of the pawns, knights, bishops, rooks and queens that aren't in the pinned bitboard.
+        When in check they have to end on a square of check_mask.
+        """
+        ally_color = "w" if self.white_to_move else "b"
+        pieces = self.piece_bitboards
+        target_mask = self.getTargetMask(captures_only) & check_mask
+        self.addPawnMoves(pieces[ally_color + "p"] & ~pinned, FULL_BOARD, moves, captures_only, check_mask)
+        self.addStepMoves(pieces[ally_color + "N"] & ~pinned, KNIGHT_ATTACKS, target_mask, moves)
+        queens = pieces[ally_color + "Q"]
+        self.addSlidingMoves((pieces[ally_color + "B"] | queens) & ~pinned, BISHOP_RAYS, target_mask, moves)
+        self.addSlidingMoves((pieces[ally_color + "R"] | queens) & ~pinned, ROOK_RAYS, target_mask, moves)
+
+    def getEvasionMoves(self):
+        """
+        All the valid moves when in check, checkForPinsAndChecks has to be up to date.
+        The king can go to any square the enemy doesn't attack. With a single check, the other pieces can also capture
+        the checking piece or block its line to the king: the check mask. A pinned piece can never do either.
+        """
+        if self.white_to_move:
+            ally_color, enemy_color = "w", "b"
+            king_row, king_col = self.white_king_location
+        else:
+            ally_color, enemy_color = "b", "w"
+            king_row, king_col = self.black_king_location
+        king_square = king_row * 8 + king_col
+        allies = self.color_bitboards[ally_color]
+        # the king is taken off the board for the attack map, a slider checking it also attacks the squares behind it
+        occupied = (allies | self.color_bitboards[enemy_color]) & ~(1 << king_square)
+        attacked = self.getAttackedSquares(enemy_color, occupied)
+        moves = []
+        self.addMoves(king_square, KING_ATTACKS[king_square] & ~allies & ~attacked, moves)
+        if len(self.checks) == 1:
+            check_row, check_col, d_row, d_col = self.checks[0]
+            check_square = check_row * 8 + check_col
+            if self.board[check_row][check_col][1] in "RBQ":  # the squares from the king up to the slider
+                direction = RAY_DIRECTIONS.index((d_row, d_col))
+                check_mask = RAYS[direction][king_square] & ~RAYS[direction][check_square]
+            else:  # a knight or a pawn has to be captured
+                check_mask = 1 << check_square
+            pinned = 0
+            for pin in self.pins:
+                pinned |= 1 << (pin[0] * 8 + pin[1])
+            self.addUnpinnedMoves(pinned, moves, check_mask=check_mask)
+        return moves
+
+    def getAttackedSquares(self, color, occupied):
+        """
+        Attack map: every square a piece of color attacks, with the sliders stopping at the occupied squares.
+        """
+        pieces = self.piece_bitboards
+        _, (left, right, left_mask), (right_left, right_right, right_mask) = PAWN_SHIFTS[color]
+        pawns = pieces[color + "p"]
+        attacked = ((pawns << left) >> right) & left_mask | ((pawns << right_left) >> right_right) & right_mask
+        attacked |= KING_ATTACKS[pieces[color + "K"].bit_length() - 1]
+        knights = pieces[color + "N"]
+        while knights:
+            knight = knights & -knights
+            attacked |= KNIGHT_ATTACKS[knight.bit_length() - 1]
+            knights ^= knight
+        queens = pieces[color + "Q"]
+        for sliders, directions in ((pieces[color + "B"] | queens, BISHOP_RAYS), (pieces[color + "R"] | queens, ROOK_RAYS)):
+            while sliders:
+                slider = sliders & -sliders
+                attacked |= rayAttacks(slider.bit_length() - 1, occupied, directions)
+                sliders ^= slider
+        return attacked
+
+    def getTargetMask(self, captures_only):
+        """
+        Squares a piece of the side to move can go to: enemy pieces, and empty squares unless only captures are wanted.
+        """
+        if captures_only:
+            return self.color_bitboards["b" if self.white_to_move else "w"]
+        return FULL_BOARD & ~self.color_bitboards["w" if self.white_to_move else "b"]
+
+    def getPinMask(self, row, col):
+        """
+        Squares the piece at row col can move to without exposing its king: the whole board if it isn't pinned,
+        otherwise the line through the king and the pinning piece.
+        """
+        for pin in self.pins:
+            if pin[0] == row and pin[1] == col:
+                direction = RAY_DIRECTIONS.index((pin[2], pin[3]))
+                return RAYS[direction][row * 8 + col] | RAYS[direction ^ 2][row * 8 + col]
+        return FULL_BOARD
+
+    def addMoves(self, square, targets, moves):
+        """
+        Add a move from square to every square in the targets bitboard.
+        """
+        start = (square >> 3, square & 7)
+        while targets:
+            target = targets & -targets
+            end_square = target.bit_length() - 1
+            moves.append(Move(start, (end_square >> 3, end_square & 7), self.board))
+            targets ^= target
+
+    def addStepMoves(self, pieces, attack_table, target_mask, moves):
+        """
+        Add the moves of every knight or king in the pieces bitboard that land in target_mask.
+        """
+        while pieces:
+            piece = pieces & -pieces
+            square = piece.bit_length() - 1
+            self.addMoves(square, attack_table[square] & target_mask, moves)
+            pieces ^= piece
+
+    def addSlidingMoves(self, pieces, directions, target_mask, moves):
+        """
+        Add the moves of every slider in the pieces bitboard that land in target_mask, along the given RAYS directions.
+        """
+        occupied = self.color_bitboards["w"] | self.color_bitboards["b"]
+        while pieces:
+            piece = pieces & -pieces
+            square = piece.bit_length() - 1
+            self.addMoves(square, rayAttacks(square, occupied, directions) & target_mask, moves)
+            pieces ^= piece
+
     def checkForPinsAndChecks(self):
+        """
+        Look outward from the king of the side to move for the enemy pieces giving check, and for pins:
+        an ally piece that is the only piece between the king and an enemy rook, bishop or queen.
+        Both are stored as (row, col, direction row, direction col), the direction going away from the king.
+        """
         pins = []  # squares pinned and the direction its pinned from
         checks = []  # squares where enemy is applying a check
-        in_check = False
         if self.white_to_move:
             enemy_color = "b"
             ally_color = "w"
-            start_row = self.white_king_location[0]
-            start_col = self.white_king_location[1]
+            king_row, king_col = self.white_king_location
         else:
             enemy_color = "w"
             ally_color = "b"
-            start_row = self.black_king_location[0]
-            start_col = self.black_king_location[1]
-        # check outwards from king for pins and checks, keep track of pins
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
-            direction = directions[j]
-            possible_pin = ()  # reset possible pins
-            for i in range(1, 8):
-                end_row = start_row + direction[0] * i
-                end_col = start_col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] == ally_color and end_piece[1] != "K":
-                        if possible_pin == ():  # first allied piece could be pinned
-                            possible_pin = (end_row, end_col, direction[0], direction[1])
-                        else:  # 2nd allied piece - no check or pin from this direction
-                            break
-                    elif end_piece[0] == enemy_color:
-                        enemy_type = end_piece[1]
-                        # 5 possibilities in this complex conditional
-                        # 1.) orthogonally away from king and piece is a rook
-                        # 2.) diagonally away from king and piece is a bishop
-                        # 3.) 1 square away diagonally from king and piece is a pawn
-                        # 4.) any direction and piece is a queen
-                        # 5.) any direction 1 square away and piece is a king
-                        if (0 <= j <= 3 and enemy_type == "R") or (4 <= j <= 7 and enemy_type == "B") or (
-                                i == 1 and enemy_type == "p" and (
-                                (enemy_color == "w" and 6 <= j <= 7) or (enemy_color == "b" and 4 <= j <= 5))) or (
-                                enemy_type == "Q") or (i == 1 and enemy_type == "K"):
-                            if possible_pin == ():  # no piece blocking, so check
-                                in_check = True
-                                checks.append((end_row, end_col, direction[0], direction[1]))
-                                break
-                            else:  # piece blocking so pin
-                                pins.append(possible_pin)
-                                break
-                        else:  # enemy piece not applying checks
-                            break
-                else:
-                    break  # off board
-        # check for knight checks
-        knight_moves = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
-        for move in knight_moves:
-            end_row = start_row + move[0]
-            end_col = start_col + move[1]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] == enemy_color and end_piece[1] == "N":  # enemy knight attacking a king
-                    in_check = True
-                    checks.append((end_row, end_col, move[0], move[1]))
-        return in_check, pins, checks
-
-    def getPawnMoves(self, row, col, moves):
+            king_row, king_col = self.black_king_location
+        king_square = king_row * 8 + king_col
+        pieces = self.piece_bitboards
+        allies = self.color_bitboards[ally_color]
+        occupied = allies | self.color_bitboards[enemy_color]
+        queens = pieces[enemy_color + "Q"]
+        rook_attackers = pieces[enemy_color + "R"] | queens
+        bishop_attackers = pieces[enemy_color + "B"] | queens
+        for direction in range(8):
+            ray = RAYS[direction][king_square]
+            attackers = ray & (rook_attackers if direction < 4 else bishop_attackers)
+            if not attackers:
+                continue  # nothing on this ray can check or pin
+            d_row, d_col = RAY_DIRECTIONS[direction]
+            first = firstSquareOnRay(ray & occupied, direction)
+            if attackers & 1 << first:
+                checks.append((first >> 3, first & 7, d_row, d_col))
+            elif allies & 1 << first:  # an ally piece is pinned if the next piece behind it is the attacker
+                second = firstSquareOnRay(RAYS[direction][first] & occupied, direction)
+                if attackers & 1 << second:
+                    pins.append((first >> 3, first & 7, d_row, d_col))
+        # knights and pawns checking the king
+        attackers = KNIGHT_ATTACKS[king_square] & pieces[enemy_color + "N"] | PAWN_ATTACKS[ally_color][king_square] & \
+            pieces[enemy_color + "p"]
+        while attackers:
+            attacker = attackers & -attackers
+            square = attacker.bit_length() - 1
+            checks.append((square >> 3, square & 7, (square >> 3) - king_row, (square & 7) - king_col))
+            attackers ^= attacker
+        return len(checks) > 0, pins, checks
+
+    def getPawnMoves(self, row, col, moves, captures_only=False):
         """
         Get all the pawn moves for the pawn located at row, col and add the moves to the list.
         """
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+        self.addPawnMoves(1 << (row * 8 + col), self.getPinMask(row, col), moves, captures_only)
 
+    def addPawnMoves(self, pawns, pin_mask, moves, captures_only, check_mask=FULL_BOARD):
+        """
+        Add the moves of every pawn in the pawns bitboard to the list, the pawns can only go to squares in pin_mask.
+        When in check they also have to end on a square of check_mask, or take the checking pawn en passant.
+        Each kind of pawn move is found for all the pawns at once by shifting the whole bitboard.
+        """
+        occupied = self.color_bitboards["w"] | self.color_bitboards["b"]
         if self.white_to_move:
             move_amount = -1
-            start_row = 6
-            enemy_color = "b"
+            double_push_row = 0xFF << 40  # pawns that got here in 1 step from their start row can go on
+            ally_color, enemy_color = "w", "b"
             king_row, king_col = self.white_king_location
         else:
             move_amount = 1
-            start_row = 1
-            enemy_color = "w"
+            double_push_row = 0xFF << 16
+            ally_color, enemy_color = "b", "w"
             king_row, king_col = self.black_king_location
+        (push_left, push_right, push_mask), (left, right, left_mask), (right_left, right_right, right_mask) = \
+            PAWN_SHIFTS[ally_color]
+        empty = FULL_BOARD & ~occupied
+        single_pushes = ((pawns << push_left) >> push_right) & push_mask & empty
+        double_pushes = ((single_pushes & double_push_row) << push_left >> push_right) & empty
+        if captures_only:
+            single_pushes &= ROW_1 | ROW_8  # only promotions count as captures
+            double_pushes = 0
+        promotion_pieces = ("Q",) if captures_only else Move.promotion_pieces  # quiescence skips under-promotions
+        enemies = self.color_bitboards[enemy_color]
+        left_captures = ((pawns << left) >> right) & left_mask & enemies
+        right_captures = ((pawns << right_left) >> right_right) & right_mask & enemies
+        for targets, d_row, d_col in ((single_pushes, move_amount, 0), (double_pushes, 2 * move_amount, 0),
+                                      (left_captures, move_amount, -1), (right_captures, move_amount, 1)):
+            targets &= pin_mask & check_mask
+            while targets:
+                target = targets & -targets
+                square = target.bit_length() - 1
+                end_row, end_col = square >> 3, square & 7
+                if target & (ROW_1 | ROW_8):
+                    for promotion_piece in promotion_pieces:
+                        moves.append(Move((end_row - d_row, end_col - d_col), (end_row, end_col), self.board,
+                                          promotion_piece=promotion_piece))
+                else:
+                    moves.append(Move((end_row - d_row, end_col - d_col), (end_row, end_col), self.board))
+                targets ^= target
+
+        if self.enpassant_possible != ():
+            enpassant_row, enpassant_col = self.enpassant_possible
+            row = enpassant_row - move_amount
+            if not pin_mask & 1 << (enpassant_row * 8 + enpassant_col) or not check_mask & (
+                    1 << (enpassant_row * 8 + enpassant_col) | 1 << (row * 8 + enpassant_col)):
+                return
+            king_square = king_row * 8 + king_col
+            enemy_queens = self.piece_bitboards[enemy_color + "Q"]
+            for col in (enpassant_col - 1, enpassant_col + 1):
+                if 0 <= col <= 7 and pawns & 1 << (row * 8 + col):
+                    # both pawns leave their squares, that can open a rank or a diagonal for an enemy slider
+                    # to attack the king, which the pins don't cover
+                    occupied_after = (occupied & ~(1 << (row * 8 + col) | 1 << (row * 8 + enpassant_col))) | (
+                            1 << (enpassant_row * 8 + enpassant_col))
+                    rook_attackers = self.piece_bitboards[enemy_color + "R"] | enemy_queens
+                    bishop_attackers = self.piece_bitboards[enemy_color + "B"] | enemy_queens
+                    if rayAttacks(king_square, occupied_after, ROOK_RAYS) & rook_attackers or rayAttacks(
+                            king_square, occupied_after, BISHOP_RAYS) & bishop_attackers:
+                        continue
+                    moves.append(Move((row, col), (enpassant_row, enpassant_col), self.board, is_enpassant_move=True))
 
-        if self.board[row + move_amount][col] == "--":  # 1 square pawn advance
-            if not piece_pinned or pin_direction == (move_amount, 0):
-                moves.append(Move((row, col), (row + move_amount, col), self.board))
-                if row == start_row and self.board[row + 2 * move_amount][col] == "--":  # 2 square pawn advance
-                    moves.append(Move((row, col), (row + 2 * move_amount, col), self.board))
-        if col - 1 >= 0:  # capture to the left
-            if not piece_pinned or pin_direction == (move_amount, -1):
-                if self.board[row + move_amount][col - 1][0] == enemy_color:
-                    moves.append(Move((row, col), (row + move_amount, col - 1), self.board))
-                if (row + move_amount, col - 1) == self.enpassant_possible:
-                    attacking_piece = blocking_piece = False
-                    if king_row == row:
-                        if king_col < col:  # king is left of the pawn
-                            # inside: between king and the pawn;
-                            # outside: between pawn and border;
-                            inside_range = range(king_col + 1, col - 1)
-                            outside_range = range(col + 1, 8)
-                        else:  # king right of the pawn
-                            inside_range = range(king_col - 1, col, -1)
-                            outside_range = range(col - 2, -1, -1)
-                        for i in inside_range:
-                            if self.board[row][i] != "--":  # some piece beside en-passant pawn blocks
-                                blocking_piece = True
-                        for i in outside_range:
-                            square = self.board[row][i]
-                            if square[0] == enemy_color and (square[1] == "R" or square[1] == "Q"):
-                                attacking_piece = True
-                            elif square != "--":
-                                blocking_piece = True
-                    if not attacking_piece or blocking_piece:
-                        moves.append(Move((row, col), (row + move_amount, col - 1), self.board, is_enpassant_move=True))
-        if col + 1 <= 7:  # capture to the right
-            if not piece_pinned or pin_direction == (move_amount, +1):
-                if self.board[row + move_amount][col + 1][0] == enemy_color:
-                    moves.append(Move((row, col), (row + move_amount, col + 1), self.board))
-                if (row + move_amount, col + 1) == self.enpassant_possible:
-                    attacking_piece = blocking_piece = False
-                    if king_row == row:
-                        if king_col < col:  # king is left of the pawn
-                            # inside: between king and the pawn;
-                            # outside: between pawn and border;
-                            inside_range = range(king_col + 1, col)
-                            outside_range = range(col + 2, 8)
-                        else:  # king right of the pawn
-                            inside_range = range(king_col - 1, col + 1, -1)
-                            outside_range = range(col - 1, -1, -1)
-                        for i in inside_range:
-                            if self.board[row][i] != "--":  # some piece beside en-passant pawn blocks
-                                blocking_piece = True
-                        for i in outside_range:
-                            square = self.board[row][i]
-                            if square[0] == enemy_color and (square[1] == "R" or square[1] == "Q"):
-                                attacking_piece = True
-                            elif square != "--":
-                                blocking_piece = True
-                    if not attacking_piece or blocking_piece:
-                        moves.append(Move((row, col), (row + move_amount, col + 1), self.board, is_enpassant_move=True))
-
-    def getRookMoves(self, row, col, moves):
+    def getRookMoves(self, row, col, moves, captures_only=False):
         """
         Get all the rook moves for the rook located at row, col and add the moves to the list.
         """
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                if self.board[row][col][
-                    1] != "Q":  # can't remove queen from pin on rook moves, only remove it on bishop moves
-                    self.pins.remove(self.pins[i])
-                break
+        self.addSlidingMoves(1 << (row * 8 + col), ROOK_RAYS,
+                             self.getTargetMask(captures_only) & self.getPinMask(row, col), moves)
 
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1))  # up, left, down, right
-        enemy_color = "b" if self.white_to_move else "w"
-        for direction in directions:
-            for i in range(1, 8):
-                end_row = row + direction[0] * i
-                end_col = col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:  # check for possible moves only in boundaries of the board
-                    if not piece_pinned or pin_direction == direction or pin_direction == (
-                            -direction[0], -direction[1]):
-                        end_piece = self.board[end_row][end_col]
-                        if end_piece == "--":  # empty space is valid
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                        elif end_piece[0] == enemy_color:  # capture enemy piece
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                            break
-                        else:  # friendly piece
-                            break
-                else:  # off board
-                    break
-
-    def getKnightMoves(self, row, col, moves):
+    def getKnightMoves(self, row, col, moves, captures_only=False):
         """
         Get all the knight moves for the knight located at row col and add the moves to the list.
         """
-        piece_pinned = False
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                self.pins.remove(self.pins[i])
-                break
-
-        knight_moves = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2),
-                        (1, -2))  # up/left up/right right/up right/down down/left down/right left/up left/down
-        ally_color = "w" if self.white_to_move else "b"
-        for move in knight_moves:
-            end_row = row + move[0]
-            end_col = col + move[1]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                if not piece_pinned:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] != ally_color:  # so its either enemy piece or empty square
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
+        if self.getPinMask(row, col) != FULL_BOARD:
+            return  # a pinned knight can never move
+        self.addStepMoves(1 << (row * 8 + col), KNIGHT_ATTACKS, self.getTargetMask(captures_only), moves)
 
-    def getBishopMoves(self, row, col, moves):
+    def getBishopMoves(self, row, col, moves, captures_only=False):
         """
         Get all the bishop moves for the bishop located at row col and add the moves to the list.
         """
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+        self.addSlidingMoves(1 << (row * 8 + col), BISHOP_RAYS,
+                             self.getTargetMask(captures_only) & self.getPinMask(row, col), moves)
 
-        directions = ((-1, -1), (-1, 1), (1, 1), (1, -1))  # diagonals: up/left up/right down/right down/left
-        enemy_color = "b" if self.white_to_move else "w"
-        for direction in directions:
-            for i in range(1, 8):
-                end_row = row + direction[0] * i
-                end_col = col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:  # check if the move is on board
-                    if not piece_pinned or pin_direction == direction or pin_direction == (
-                            -direction[0], -direction[1]):
-                        end_piece = self.board[end_row][end_col]
-                        if end_piece == "--":  # empty space is valid
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                        elif end_piece[0] == enemy_color:  # capture enemy piece
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                            break
-                        else:  # friendly piece
-                            break
-                else:  # off board
-                    break
-
-    def getQueenMoves(self, row, col, moves):
+    def getQueenMoves(self, row, col, moves, captures_only=False):
         """
         Get all the queen moves for the queen located at row col and add the moves to the list.
         """
-        self.getBishopMoves(row, col, moves)
-        self.getRookMoves(row, col, moves)
+        self.getBishopMoves(row, col, moves, captures_only)
+        self.getRookMoves(row, col, moves, captures_only)
 
-    def getKingMoves(self, row, col, moves):
+    def getKingMoves(self, row, col, moves, captures_only=False):
         """
         Get all the king moves for the king located at row col and add the moves to the list.
         """
-        row_moves = (-1, -1, -1, 0, 0, 1, 1, 1)
-        col_moves = (-1, 0, 1, -1, 1, -1, 0, 1)
+        targets = KING_ATTACKS[row * 8 + col] & self.getTargetMask(captures_only)
+        if not targets:
+            return
+        # take the king off the board while looking for attacks, so it doesn't hide the squares behind it
+        # on the line of a checking slider
+        king = 1 << (row * 8 + col)
         ally_color = "w" if self.white_to_move else "b"
-        for i in range(8):
-            end_row = row + row_moves[i]
-            end_col = col + col_moves[i]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally_color:  # not an ally piece - empty or enemy
-                    # place king on end square and check for checks
-                    if ally_color == "w":
-                        self.white_king_location = (end_row, end_col)
-                    else:
-                        self.black_king_location = (end_row, end_col)
-                    in_check, pins, checks = self.checkForPinsAndChecks()
-                    if not in_check:
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
-                    # place king back on original location
-                    if ally_color == "w":
-                        self.white_king_location = (row, col)
-                    else:
-                        self.black_king_location = (row, col)
+        self.color_bitboards[ally_color] ^= king
+        while targets:
+            target = targets & -targets
+            square = target.bit_length() - 1
+            if not self.squareUnderAttack(square >> 3, square & 7):
+                moves.append(Move((row, col), (square >> 3, square & 7), self.board))
+            targets ^= target
+        self.color_bitboards[ally_color] ^= king
 
     def getCastleMoves(self, row, col, moves):
         """
@@ -536,11 +1062,9 @@ class GameState:
         """
         if self.squareUnderAttack(row, col):
             return  # can't castle while in check
-        if (self.white_to_move and self.current_castling_rights.wks) or (
-                not self.white_to_move and self.current_castling_rights.bks):
+        if self.current_castling_rights & (CASTLE_WKS if self.white_to_move else CASTLE_BKS):
             self.getKingsideCastleMoves(row, col, moves)
-        if (self.white_to_move and self.current_castling_rights.wqs) or (
-                not self.white_to_move and self.current_castling_rights.bqs):
+        if self.current_castling_rights & (CASTLE_WQS if self.white_to_move else CASTLE_BQS):
             self.getQueensideCastleMoves(row, col, moves)
 
     def getKingsideCastleMoves(self, row, col, moves):
@@ -554,15 +1078,22 @@ class GameState:
                 moves.append(Move((row, col), (row, col - 2), self.board, is_castle_move=True))
 
 
-class CastleRights:
-    def __init__(self, wks, bks, wqs, bqs):
-        self.wks = wks
-        self.bks = bks
-        self.wqs = wqs
-        self.bqs = bqs
+# Kinds of moves, stored in bits 12-14 of Move.moveID. A promotion adds the index of the piece in
+# Move.promotion_pieces to MOVE_PROMOTION.
+MOVE_NORMAL = 0
+MOVE_ENPASSANT = 1
+MOVE_CASTLE = 2
+MOVE_PROMOTION = 3
 
 
 class Move:
+    """
+    A move, kept small with __slots__ since the search makes millions of them.
+    moveID packs the whole move into one int: start square (row * 8 + col) in bits 0-5, end square in bits 6-11
+    and the kind of move in bits 12-14. The AI stores moves as moveIDs, fromID turns one back into a Move.
+    """
+    __slots__ = ("start_row", "start_col", "end_row", "end_col", "piece_moved", "piece_captured", "is_pawn_promotion",
+                 "promotion_piece", "is_enpassant_move", "is_castle_move", "is_capture", "moveID")
     # in chess, fields on the board are described by two symbols, one of them being number between 1-8 (which is corresponding to rows)
     # and the second one being a letter between a-f (corresponding to columns), in order to use this notation we need to map our [row][col] coordinates
     # to match the ones used in the original chess game
@@ -573,7 +1104,10 @@ class Move:
                      "e": 4, "f": 5, "g": 6, "h": 7}
     cols_to_files = {v: k for k, v in files_to_cols.items()}
 
-    def __init__(self, start_square, end_square, board, is_enpassant_move=False, is_castle_move=False):
+    promotion_pieces = ("Q", "R", "B", "N")
+
+    def __init__(self, start_square, end_square, board, is_enpassant_move=False, is_castle_move=False,
+                 promotion_piece="Q"):
         self.start_row = start_square[0]
         self.start_col = start_square[1]
         self.end_row = end_square[0]
@@ -583,6 +1117,7 @@ class Move:
         # pawn promotion
         self.is_pawn_promotion = (self.piece_moved == "wp" and self.end_row == 0) or (
                 self.piece_moved == "bp" and self.end_row == 7)
+        self.promotion_piece = promotion_piece if self.is_pawn_promotion else None  # "Q", "R", "B" or "N"
         # en passant
         self.is_enpassant_move = is_enpassant_move
         if self.is_enpassant_move:
@@ -591,7 +1126,27 @@ class Move:
         self.is_castle_move = is_castle_move
 
         self.is_capture = self.piece_captured != "--"
-        self.moveID = self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col
+        if self.is_pawn_promotion:  # the same pawn move promoting to another piece is another move
+            kind = MOVE_PROMOTION + self.promotion_pieces.index(promotion_piece)
+        elif is_enpassant_move:
+            kind = MOVE_ENPASSANT
+        elif is_castle_move:
+            kind = MOVE_CASTLE
+        else:
+            kind = MOVE_NORMAL
+        self.moveID = self.start_row * 8 + self.start_col | (self.end_row * 8 + self.end_col) << 6 | kind << 12
+
+    @classmethod
+    def fromID(cls, move_id, board):
+        """
+        Unpack a moveID into a Move on the board, the inverse of Move.moveID.
+        """
+        start_square = move_id & 63
+        end_square = (move_id >> 6) & 63
+        kind = move_id >> 12
+        return cls((start_square >> 3, start_square & 7), (end_square >> 3, end_square & 7), board,
+                   is_enpassant_move=kind == MOVE_ENPASSANT, is_castle_move=kind == MOVE_CASTLE,
+                   promotion_piece=cls.promotion_pieces[kind - MOVE_PROMOTION] if kind >= MOVE_PROMOTION else "Q")
 
     def __eq__(self, other):
         """
@@ -601,9 +1156,12 @@ class Move:
             return self.moveID == other.moveID
         return False
 
+    def __hash__(self):
+        return self.moveID
+
     def getChessNotation(self):
         if self.is_pawn_promotion:
-            return self.getRankFile(self.end_row, self.end_col) + "Q"
+            return self.getRankFile(self.end_row, self.end_col) + self.promotion_piece
         if self.is_castle_move:
             if self.end_col == 1:
                 return "0-0-0"
@@ -629,6 +1187,15 @@ class Move:
     def getRankFile(self, row, col):
         return self.cols_to_files[col] + self.rows_to_ranks[row]
 
+    def getUciNotation(self):
+        """
+        Start and end square with the promotion piece if any, e.g. "e2e4" or "e7e8q".
+        """
+        notation = self.getRankFile(self.start_row, self.start_col) + self.getRankFile(self.end_row, self.end_col)
+        if self.is_pawn_promotion:
+            notation += self.promotion_piece.lower()
+        return notation
+
     def __str__(self):
         if self.is_castle_move:
             return "0-0" if self.end_col == 6 else "0-0-0"
@@ -637,9 +1204,8 @@ class Move:
 
         if self.piece_moved[1] == "p":
             if self.is_capture:
-                return self.cols_to_files[self.start_col] + "x" + end_square
-            else:
-                return end_square + "Q" if self.is_pawn_promotion else end_square
+                end_square = self.cols_to_files[self.start_col] + "x" + end_square
+            return end_square + self.promotion_piece if self.is_pawn_promotion else end_square
 
         move_string = self.piece_moved[1]
         if self.is_capture:
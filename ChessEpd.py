@@ -0,0 +1,114 @@
+"""
+Runs the engine over an EPD test suite: every position is searched to a fixed depth or for a fixed time in a pool of
+processes and its best move (bm) or avoid move (am) operations are checked. The file is read as the positions are
+handed out, so suites of any size can be run.
+python ChessEpd.py file.epd [--depth N | --time SECONDS] [--processes N]
+An EPD line is the first four FEN fields followed by operations, e.g.
+2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - bm Qg6; id "WAC.001";
+"""
+import argparse
+import random
+import time
+from multiprocessing import Pool
+from queue import Queue
+
+import ChessAI
+import ChessEngine
+
+EPD_DEPTH = 5
+
+
+def parseEpd(line):
+    """
+    Split an EPD line into the FEN of its position and a dict of its operations, {"bm": ["Qg6"], "id": ["WAC.001"]}.
+    The move counters come from the hmvc and fmvn operations when they are there.
+    """
+    words = line.split()
+    operations = {}
+    for operation in " ".join(words[4:]).split(";"):
+        opcode, _, operand = operation.strip().partition(" ")
+        if opcode:
+            operations[opcode] = [word.strip('"') for word in operand.split()] if '"' not in operand \
+                else [operand.strip().strip('"')]
+    halfmove_clock = operations.get("hmvc", ["0"])[0]
+    fullmove_number = operations.get("fmvn", ["1"])[0]
+    return " ".join(words[:4] + [halfmove_clock, fullmove_number]), operations
+
+
+def sameMove(game_state, move, text, valid_moves):
+    """
+    Whether text names move, in SAN (check marks and annotations are ignored) or in UCI notation.
+    """
+    if text == move.getUciNotation():
+        return True
+    return game_state.getSanNotation(move, valid_moves).rstrip("+#") == text.rstrip("+#!?")
+
+
+def analysePosition(task):
+    """
+    Search one EPD line, returns (line number, id, SAN of the move found, solved, nodes, seconds).
+    solved is None when the line has neither a bm nor an am operation.
+    """
+    line_number, line, depth, time_limit = task
+    fen, operations = parseEpd(line)
+    game_state = ChessEngine.GameState(fen)
+    valid_moves = game_state.getValidMoves()
+    ChessAI.transposition_table.clear()  # every position gets the same start, whichever process searches it
+    random.seed(0)
+    return_queue = Queue()
+    start = time.time()
+    ChessAI.findBestMove(game_state, valid_moves, return_queue, time_limit, depth)
+    seconds = time.time() - start
+    move = return_queue.get()
+    solved = None
+    if move is not None and ("bm" in operations or "am" in operations):
+        solved = all(any(sameMove(game_state, move, text, valid_moves) for text in operations[opcode]) == wanted
+                     for opcode, wanted in (("bm", True), ("am", False)) if opcode in operations)
+    san = game_state.getSanNotation(move, valid_moves) if move is not None else "none"
+    position_id = operations.get("id", [str(line_number)])[0]
+    return line_number, position_id, san, solved, ChessAI.nodes_searched, seconds
+
+
+def readTasks(path, depth, time_limit):
+    with open(path) as epd_file:
+        for line_number, line in enumerate(epd_file, 1):
+            if line.strip() and not line.startswith("#"):
+                yield line_number, line, depth, time_limit
+
+
+def runSuite(path, depth=EPD_DEPTH, time_limit=None, processes=None):
+    """
+    Analyse every position of the file, prints a line per position as it is done and a summary at the end.
+    Returns the number of positions solved and the number with a bm or am to check.
+    """
+    solved = checked = positions = nodes = 0
+    start = time.time()
+    with Pool(processes) as pool:
+        for line_number, position_id, san, result, position_nodes, seconds in \
+                pool.imap_unordered(analysePosition, readTasks(path, depth, time_limit)):
+            positions += 1
+            nodes += position_nodes
+            if result is not None:
+                checked += 1
+                solved += result
+            status = {True: "ok", False: "FAIL", None: "-"}[result]
+            print(f"{line_number:>6} {position_id:<16} {san:<8} {status:<4} {position_nodes:>9} nodes {seconds:6.2f}s",
+                  flush=True)
+    elapsed = max(time.time() - start, 1e-6)
+    print(f"\nsolved {solved}/{checked}, {positions} positions, {nodes} nodes in {elapsed:.1f}s, "
+          f"{nodes / elapsed:.0f} nodes/s, {positions / elapsed:.2f} positions/s")
+    return solved, checked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the positions of an EPD file and check the best moves.")
+    parser.add_argument("path")
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument("--depth", type=int, default=None, help=f"search depth (default {EPD_DEPTH})")
+    limit.add_argument("--time", type=float, default=None, help="seconds per position instead of a fixed depth")
+    parser.add_argument("--processes", type=int, default=None, help="default: one per core")
+    arguments = parser.parse_args()
+    if arguments.time is not None:
+        runSuite(arguments.path, ChessAI.MAX_DEPTH, arguments.time, arguments.processes)
+    else:
+        runSuite(arguments.path, arguments.depth or EPD_DEPTH, None, arguments.processes)
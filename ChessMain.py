@@ -1,7 +1,6 @@
 import pygame as p
-import ChessEngine, ChessAI
+import ChessEngine, ChessAI, ChessWorker
 import sys
-from multiprocessing import Process, Queue
 
 # Constants - Increased board size
 BOARD_WIDTH = BOARD_HEIGHT = 700  # Increased from 552
@@ -10,6 +9,7 @@ MOVE_LOG_PANEL_HEIGHT = BOARD_HEIGHT
 DIMENSION = 8
 SQUARE_SIZE = BOARD_HEIGHT // DIMENSION
 MAX_FPS = 15
+PONDER = True  # the AI keeps thinking on the human's time, about the reply it expects
 IMAGES = {}
 
 # Background colors
@@ -128,6 +128,18 @@ def showStartScreen(screen):
     return player_one, player_two
 
 # Main game function
+def findClickedMove(valid_moves, start_square, end_square):
+    """
+    The valid move from start_square to end_square, None if there is none. Compared by squares and not by moveID,
+    a clicked move doesn't know whether it castles or takes en passant. Clicked pawns always promote to a queen.
+    """
+    for move in valid_moves:
+        if (move.start_row, move.start_col) == start_square and (move.end_row, move.end_col) == end_square and \
+                move.promotion_piece in (None, "Q"):
+            return move
+    return None
+
+
 def main():
     """
     The main driver for our code. This will handle user input and update the graphics.
@@ -160,7 +172,7 @@ def main():
     game_over = False
     ai_thinking = False
     move_undone = False
-    move_finder_process = None
+    engine = ChessWorker.EngineProcess()  # searches the AI moves, lives as long as the game window
     move_log_font = p.font.SysFont("Arial", 16, False, False)  # Slightly larger font
     button_font = p.font.SysFont("Helvetica", 24)
     
@@ -198,9 +210,8 @@ def main():
                         move_made = False
                         animate = False
                         game_over = False
-                        if ai_thinking:
-                            move_finder_process.terminate()
-                            ai_thinking = False
+                        engine.newGame()
+                        ai_thinking = False
                         move_undone = False
                 else:
                     location = p.mouse.get_pos()
@@ -213,14 +224,14 @@ def main():
                         square_selected = (row, col)
                         player_clicks.append(square_selected)
                     if len(player_clicks) == 2 and human_turn:  # After second click
-                        move = ChessEngine.Move(player_clicks[0], player_clicks[1], game_state.board)
-                        for i in range(len(valid_moves)):
-                            if move == valid_moves[i]:
-                                game_state.makeMove(valid_moves[i])
-                                move_made = True
-                                animate = True
-                                square_selected = ()  # Reset user clicks
-                                player_clicks = []
+                        move = findClickedMove(valid_moves, player_clicks[0], player_clicks[1])
+                        if move is not None:
+                            game_state.makeMove(move)
+                            engine.makeMove(move)
+                            move_made = True
+                            animate = True
+                            square_selected = ()  # Reset user clicks
+                            player_clicks = []
                         if not move_made:
                             player_clicks = [square_selected]
 
@@ -228,12 +239,11 @@ def main():
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z:  # Undo when 'z' is pressed
                     game_state.undoMove()
+                    engine.undoMove()
                     move_made = True
                     animate = False
                     game_over = False
-                    if ai_thinking:
-                        move_finder_process.terminate()
-                        ai_thinking = False
+                    ai_thinking = False
                     move_undone = True
                 if e.key == p.K_r:  # Reset the game when 'r' is pressed
                     player_one, player_two = showStartScreen(screen)
@@ -244,24 +254,25 @@ def main():
                     move_made = False
                     animate = False
                     game_over = False
-                    if ai_thinking:
-                        move_finder_process.terminate()
-                        ai_thinking = False
+                    engine.newGame()
+                    ai_thinking = False
                     move_undone = True
 
         # AI move finder
         if not game_over and not human_turn and not move_undone:
             if not ai_thinking:
                 ai_thinking = True
-                return_queue = Queue()  # Used to pass data between threads
-                move_finder_process = Process(target=ChessAI.findBestMove, args=(game_state, valid_moves, return_queue))
-                move_finder_process.start()
+                engine.go()
 
-            if not move_finder_process.is_alive():
-                ai_move = return_queue.get()
+            ai_move_id = engine.poll()
+            if ai_move_id is not None:
+                ai_move = next((move for move in valid_moves if move.moveID == ai_move_id), None)
                 if ai_move is None:
                     ai_move = ChessAI.findRandomMove(valid_moves)
                 game_state.makeMove(ai_move)
+                engine.makeMove(ai_move)
+                if PONDER and (player_one if game_state.white_to_move else player_two):  # a human replies
+                    engine.ponder()
                 move_made = True
                 animate = True
                 ai_thinking = False
@@ -294,6 +305,13 @@ def main():
             game_over = True
             drawEndGameText(screen, "Stalemate")
 
+        elif game_state.draw:
+            game_over = True
+            if game_state.halfmove_clock >= 100:
+                drawEndGameText(screen, "Draw by fifty-move rule")
+            else:
+                drawEndGameText(screen, "Draw by repetition")
+
         clock.tick(MAX_FPS)
         p.display.flip()
 
@@ -0,0 +1,226 @@
+"""
+Parallel search by root splitting. Every iteration of the iterative deepening deals the root moves out to the
+search processes, each one searches its share with its own transposition table, and the best result wins.
+Process i always gets share i and the results are combined in share order, so the outcome does not depend on
+which process finishes first: a depth or node limited search always picks the same move.
+"""
+import threading
+import time
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+
+import ChessAI
+import ChessEngine
+
+WAIT_INTERVAL = 0.01  # seconds between checks for a stop while waiting on the search processes
+
+nodes_searched = 0  # positions visited by all processes together in the last search
+root_split_search = None  # started by the first parallel search
+
+
+def movesFromIDs(game_state, move_ids):
+    """
+    The Move objects of a line of moveIDs played from the position.
+    """
+    moves = []
+    for move_id in move_ids:
+        moves.append(ChessEngine.Move.fromID(move_id, game_state.board))
+        game_state.makeMove(moves[-1])
+    for _ in moves:
+        game_state.undoMove()
+    return moves
+
+
+def searchShare(game_state, move_ids, depth, alpha, connection):
+    """
+    One iteration over a share of the root moves, sends back (score, principal variation moveIDs, nodes, aborted).
+    """
+    moves = [ChessEngine.Move.fromID(move_id, game_state.board) for move_id in move_ids]
+    nodes_before = ChessAI.nodes_searched
+    score, line = ChessAI.searchRoot(game_state, moves, depth, alpha)
+    connection.send((score, [move.moveID for move in line], ChessAI.nodes_searched - nodes_before,
+                     ChessAI.search_aborted))
+
+
+def rootSearchWorker(connection):
+    """
+    Main loop of a search process, commands are ("position", game_state, time_limit, node_limit),
+    ("search", move_ids, depth, alpha), ("stop",), ("newgame",) and ("quit",).
+    Like ChessWorker.engineWorker the search runs in a thread, every search is answered once, also when stopped.
+    """
+    game_state = None
+    deadline = float("inf")
+    search_thread = None
+    while True:
+        try:
+            command, *args = connection.recv()
+        except EOFError:
+            break  # the parent is gone
+        if search_thread is not None:
+            while search_thread.is_alive():
+                ChessAI.stopSearch()
+                search_thread.join(WAIT_INTERVAL)
+            search_thread = None
+        if command == "position":
+            game_state = args[0]
+            ChessAI.startSearch(*args[1:])
+            deadline = ChessAI.search_deadline
+        elif command == "search":
+            # a thread that already answered may still have been running above, then the stop wasn't meant for it
+            ChessAI.search_deadline = deadline
+            search_thread = threading.Thread(target=searchShare, args=(game_state, *args, connection), daemon=True)
+            search_thread.start()
+        elif command == "newgame":
+            ChessAI.transposition_table.clear()
+        elif command == "quit":
+            break
+
+
+class RootSplitSearch:
+    """
+    The search processes, started once and kept for the following searches so their tables stay warm.
+    """
+
+    def __init__(self, threads):
+        self.threads = threads
+        self.connections = []
+        self.processes = []
+        for _ in range(threads):
+            connection, worker_connection = Pipe()
+            process = Process(target=rootSearchWorker, args=(worker_connection,), daemon=True)
+            process.start()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def searchShares(self, shares, depth, alpha):
+        """
+        Share i is searched by process i, returns the results in share order (None if the search was cut short)
+        and the nodes all processes searched.
+        """
+        pending = {}
+        for connection, share in zip(self.connections, shares):
+            if share:
+                connection.send(("search", [move.moveID for move in share], depth, alpha))
+                pending[connection] = None
+        stopped = False
+        while None in pending.values():
+            for connection in wait([c for c, result in pending.items() if result is None], WAIT_INTERVAL):
+                pending[connection] = connection.recv()
+            if not stopped and time.time() >= ChessAI.search_deadline and depth > 1:
+                for connection, result in pending.items():
+                    if result is None:
+                        connection.send(("stop",))
+                stopped = True
+        nodes = sum(result[2] for result in pending.values())
+        if any(result[3] for result in pending.values()):
+            return None, nodes
+        return list(pending.values()), nodes
+
+    def searchIteration(self, ordered_moves, depth):
+        """
+        Search the moves to depth. The first move is searched alone with the full window, the others are dealt out,
+        move i + 1 to process i % threads, and only have to prove whether they beat it.
+        Returns the best (score, principal variation moveIDs), None if the iteration was cut short, and the nodes.
+        """
+        results, nodes = self.searchShares([ordered_moves[:1]], depth, -ChessAI.CHECKMATE)
+        if results is None:
+            return None, nodes
+        best = results[0][:2]
+        rest = ordered_moves[1:]
+        results, more_nodes = self.searchShares([rest[i::self.threads] for i in range(self.threads)], depth,
+                                                best[0])
+        if results is None:
+            return None, nodes + more_nodes
+        for score, line, _, _ in results:  # in share order, so ties go to the same move every time
+            if score > best[0]:
+                best = (score, line)
+        return best, nodes + more_nodes
+
+    def findBestMove(self, game_state, valid_moves, return_queue, time_limit, max_depth, node_limit=None,
+                     report=None):
+        """
+        Iterative deepening like ChessAI.findBestMove, node_limit is per process.
+        """
+        global nodes_searched
+        start_time = ChessAI.startSearch(time_limit, node_limit)
+        for connection in self.connections:
+            connection.send(("position", game_state, time_limit, node_limit))
+        ordered_moves = sorted(valid_moves, key=lambda move: ChessAI.scoreMove(move, 0, ChessAI.NO_KILLERS),
+                               reverse=True)
+        nodes_searched = 0
+        best_move = None
+        principal_variation = []
+        for depth in range(1, min(max_depth, ChessAI.MAX_PLY) + 1):
+            best, nodes = self.searchIteration(ordered_moves, depth)
+            nodes_searched += nodes
+            if best is None:
+                break
+            score, line = best
+            if line:
+                best_move = next(move for move in ordered_moves if move.moveID == line[0])
+                principal_variation = movesFromIDs(game_state, line)
+            else:  # no share kept a move, play the one expected to be best rather than none
+                best_move = ordered_moves[0]
+                principal_variation = [best_move]
+            if report is not None:
+                report(depth, score, nodes_searched, time.time() - start_time, principal_variation)
+            ordered_moves.remove(best_move)
+            ordered_moves.insert(0, best_move)  # the best move is searched first by process 0 next iteration
+            if abs(score) == ChessAI.CHECKMATE or len(valid_moves) <= 1:
+                break
+            if time.time() - start_time > (ChessAI.search_deadline - start_time) / 2:
+                break
+        return_queue.put(best_move)
+        return principal_variation
+
+    def newGame(self):
+        for connection in self.connections:
+            connection.send(("newgame",))
+
+    def close(self):
+        for connection, process in zip(self.connections, self.processes):
+            connection.send(("quit",))
+            process.join()
+
+
+def findBestMove(game_state, valid_moves, return_queue, time_limit=ChessAI.TIME_LIMIT, max_depth=ChessAI.MAX_DEPTH,
+                 node_limit=None, threads=None, report=None):
+    """
+    ChessAI.findBestMove split over threads processes (ChessAI.THREADS by default), with one thread it simply
+    searches in this process. The processes are kept for the next searches.
+    """
+    global nodes_searched
+    threads = threads if threads is not None else ChessAI.THREADS
+    if threads <= 1:
+        principal_variation = ChessAI.findBestMove(game_state, valid_moves, return_queue, time_limit, max_depth,
+                                                   node_limit, report)
+        nodes_searched = ChessAI.nodes_searched
+        return principal_variation
+    startSearchProcesses(threads)
+    return root_split_search.findBestMove(game_state, valid_moves, return_queue, time_limit, max_depth, node_limit,
+                                          report)
+
+
+def startSearchProcesses(threads=None):
+    """
+    Start the search processes for threads (ChessAI.THREADS by default) unless they are running already.
+    findBestMove starts them when needed, but a program that searches in a thread while its main thread reads
+    stdin must call this from the main thread first: a process forked from the search thread inherits the stdin
+    lock held by the main thread and hangs when it closes stdin on startup.
+    """
+    global root_split_search
+    threads = threads if threads is not None else ChessAI.THREADS
+    if threads <= 1 or (root_split_search is not None and root_split_search.threads == threads):
+        return
+    if root_split_search is not None:
+        root_split_search.close()
+    root_split_search = RootSplitSearch(threads)
+
+
+def newGame():
+    """
+    Forget the positions of the last game, in this process and in the search processes.
+    """
+    ChessAI.transposition_table.clear()
+    if root_split_search is not None:
+        root_split_search.newGame()
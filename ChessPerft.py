@@ -0,0 +1,92 @@
+"""
+Perft: count every position a few moves ahead and compare with the known numbers of reference positions.
+Any difference means the move generator is wrong. Run from the command line:
+python ChessPerft.py suite [max_nodes] [processes]
+python ChessPerft.py divide depth [processes] ["fen"]
+"""
+import sys
+import time
+from multiprocessing import Pool
+
+import ChessEngine
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# name, FEN and the number of positions at depth 1, 2, 3, ...
+PERFT_POSITIONS = (
+    ("start", START_FEN, (20, 400, 8902, 197281, 4865609)),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     (48, 2039, 97862, 4085603)),
+    ("enpassant", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", (14, 191, 2812, 43238, 674624)),
+    ("promotion", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", (6, 264, 9467, 422333)),
+    ("promotion2", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", (44, 1486, 62379, 2103487)),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     (46, 2079, 89890, 3894594)),
+)
+SUITE_MAX_NODES = 100000  # the suite only runs the depths with at most this many positions
+
+
+def perftAfterMove(fen, move_id, depth):
+    """
+    perft of the position after one move, the work one process does when the first moves are shared out.
+    """
+    game_state = ChessEngine.GameState(fen)
+    game_state.makeMove(ChessEngine.Move.fromID(move_id, game_state.board))
+    return game_state.perft(depth - 1)
+
+
+def divide(fen, depth, pool=None):
+    """
+    Positions depth moves ahead split up by the first move, as a dict {move in UCI notation: positions}.
+    With a multiprocessing pool the first moves are counted in parallel.
+    """
+    game_state = ChessEngine.GameState(fen)
+    if pool is None:
+        return game_state.divide(depth)
+    moves = game_state.getValidMoves()
+    counts = pool.starmap(perftAfterMove, [(fen, move.moveID, depth) for move in moves])
+    return {move.getUciNotation(): count for move, count in zip(moves, counts)}
+
+
+def runSuite(max_nodes=SUITE_MAX_NODES, processes=1):
+    """
+    Check the reference positions at every depth up to max_nodes positions, returns the number of wrong counts.
+    """
+    failures = 0
+    pool = Pool(processes) if processes > 1 else None
+    try:
+        for name, fen, expected_counts in PERFT_POSITIONS:
+            for depth, expected in enumerate(expected_counts, 1):
+                if expected > max_nodes:
+                    break
+                start = time.time()
+                nodes = sum(divide(fen, depth, pool).values())
+                elapsed = max(time.time() - start, 1e-9)
+                status = "ok" if nodes == expected else f"FAILED, expected {expected}"
+                print(f"{name:<12} depth {depth}  {nodes:>9} {elapsed:7.2f}s {nodes / elapsed:8.0f} nodes/s  {status}")
+                failures += nodes != expected
+    finally:
+        if pool is not None:
+            pool.close()
+    return failures
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "suite":
+        failures = runSuite(*map(int, sys.argv[2:4]))
+        print(f"{failures} failed" if failures else "all counts match")
+        sys.exit(1 if failures else 0)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "divide":
+        processes = int(sys.argv[3]) if len(sys.argv) >= 4 else 1
+        fen = sys.argv[4] if len(sys.argv) >= 5 else START_FEN
+        divide_pool = Pool(processes) if processes > 1 else None
+        counts = divide(fen, int(sys.argv[2]), divide_pool)
+        if divide_pool is not None:
+            divide_pool.close()
+        for uci_move, count in sorted(counts.items()):
+            print(f"{uci_move}: {count}")
+        print(f"\n{sum(counts.values())} positions")
+    else:
+        print('usage: python ChessPerft.py suite [max_nodes] [processes]\n'
+              '       python ChessPerft.py divide depth [processes] ["fen"]')
+        sys.exit(1)
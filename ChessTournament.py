@@ -0,0 +1,217 @@
+"""
+Headless self-play between two engine configurations, to check that a search or evaluation change is an
+improvement. The games run in parallel in a process pool, results are printed as games finish and written as PGN.
+python ChessTournament.py [--games N] [--processes N] [--nodes N] [--a SETTING=VALUE ...] [--b SETTING=VALUE ...]
+The settings are ChessAI module constants, e.g. --b NULL_MOVE_PRUNING=False.
+"""
+import argparse
+import ast
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from queue import Queue
+
+import ChessAI
+import ChessEngine
+
+OPENING_PLIES = 6  # every pair of games starts with its own random opening, played once with each color
+MAX_GAME_PLIES = 400  # longer games are adjudicated as draws
+NODES_PER_MOVE = 2000  # searches are limited by nodes, not time, so games don't depend on the machine's load
+TABLE_SIZE_MB = 4  # per engine and process
+
+
+def parseSettings(assignments):
+    """
+    ["NULL_MOVE_PRUNING=False", "LMR_LATE_MOVES=6"] -> {"NULL_MOVE_PRUNING": False, "LMR_LATE_MOVES": 6}
+    """
+    settings = {}
+    for assignment in assignments:
+        name, value = assignment.split("=", 1)
+        if not hasattr(ChessAI, name):
+            raise ValueError(f"ChessAI has no setting {name}")
+        settings[name] = ast.literal_eval(value)
+    return settings
+
+
+def insufficientMaterial(game_state):
+    """
+    Neither side can mate: only kings and at most one knight or bishop are left.
+    """
+    pieces = [piece[1] for row in game_state.board for piece in row if piece != "--"]
+    return all(piece in "KNB" for piece in pieces) and len(pieces) <= 3
+
+
+def playOpening(game_state, seed):
+    """
+    Random moves, returned in SAN.
+    """
+    rng = random.Random(seed)
+    san_moves = []
+    for _ in range(OPENING_PLIES):
+        moves = game_state.getValidMoves()
+        if not moves:
+            break
+        move = rng.choice(moves)
+        san_moves.append(game_state.getSanNotation(move, moves))
+        game_state.makeMove(move)
+    return san_moves
+
+
+def playGame(game_index, white_settings, black_settings, nodes_per_move):
+    """
+    Play one game, returns (game_index, result, how it ended, SAN moves). Games 2k and 2k + 1 share an opening.
+    """
+    game_state = ChessEngine.GameState()
+    san_moves = playOpening(game_state, game_index // 2)
+    defaults = {name: getattr(ChessAI, name) for name in set(white_settings) | set(black_settings)}
+    tables = {True: ChessAI.TranspositionTable(TABLE_SIZE_MB), False: ChessAI.TranspositionTable(TABLE_SIZE_MB)}
+    default_table = ChessAI.transposition_table
+    random.seed(game_index)
+    try:
+        result, termination = playMoves(game_state, san_moves, white_settings, black_settings, defaults, tables,
+                                        nodes_per_move)
+    finally:  # the process plays more games, leave ChessAI as it was
+        for name, value in defaults.items():
+            setattr(ChessAI, name, value)
+        ChessAI.transposition_table = default_table
+    return game_index, result, termination, san_moves
+
+
+def playMoves(game_state, san_moves, white_settings, black_settings, defaults, tables, nodes_per_move):
+    """
+    Let the engines play until the game is over, returns the result and how the game ended.
+    """
+    while True:
+        valid_moves = game_state.getValidMoves()
+        if game_state.checkmate:
+            result, termination = ("0-1" if game_state.white_to_move else "1-0"), "checkmate"
+            break
+        if game_state.stalemate:
+            result, termination = "1/2-1/2", "stalemate"
+            break
+        if game_state.draw:
+            result = "1/2-1/2"
+            termination = "fifty-move rule" if game_state.halfmove_clock >= 100 else "repetition"
+            break
+        if insufficientMaterial(game_state):
+            result, termination = "1/2-1/2", "insufficient material"
+            break
+        if len(game_state.undo_stack) >= MAX_GAME_PLIES:
+            result, termination = "1/2-1/2", "adjudicated"
+            break
+        settings = dict(defaults, **(white_settings if game_state.white_to_move else black_settings))
+        for name, value in settings.items():
+            setattr(ChessAI, name, value)
+        ChessAI.transposition_table = tables[game_state.white_to_move]
+        return_queue = Queue()
+        ChessAI.findBestMove(game_state, valid_moves, return_queue, time_limit=None, node_limit=nodes_per_move)
+        move = return_queue.get()
+        if move is None:  # the search kept no move, it must not end the game while there are legal ones
+            move = valid_moves[0]
+        san_moves.append(game_state.getSanNotation(move, valid_moves))
+        game_state.makeMove(move)
+    return result, termination
+
+
+def formatPgn(game_index, white, black, result, termination, san_moves):
+    tags = (("Event", "Self-play"), ("Site", "?"), ("Date", time.strftime("%Y.%m.%d")), ("Round", game_index + 1),
+            ("White", white), ("Black", black), ("Result", result), ("Termination", termination))
+    lines = [f'[{name} "{value}"]' for name, value in tags]
+    words = []
+    for i, san in enumerate(san_moves):
+        if i % 2 == 0:
+            words.append(f"{i // 2 + 1}.")
+        words.append(san)
+    words.append(result)
+    text, line = [], ""
+    for word in words:  # PGN lines are at most 80 characters
+        if len(line) + len(word) + 1 > 80:
+            text.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    text.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(text) + "\n\n"
+
+
+def eloDifference(wins, draws, losses):
+    """
+    Elo difference of A over B and its 95% confidence interval (low, high), from the score per game.
+    low and high are None while the games can't estimate the interval: all of them ended alike, so they show no
+    spread, or A won or lost them all.
+    """
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    deviation = math.sqrt((wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games)
+    margin = 1.96 * deviation / math.sqrt(games)
+
+    def elo(p):
+        if p <= 0:
+            return -math.inf
+        if p >= 1:
+            return math.inf
+        return 400 * math.log10(p / (1 - p))
+
+    if deviation == 0 or score in (0, 1):
+        return elo(score), None, None
+    return elo(score), elo(score - margin), elo(score + margin)
+
+
+def runTournament(games, processes, settings_a, settings_b, nodes_per_move=NODES_PER_MOVE, pgn_path=None):
+    """
+    Play the games, A has white in the even ones. Returns the wins, draws and losses of A.
+    A game that fails is reported and left out, the others still count.
+    """
+    wins = draws = losses = 0
+    names = ("A " + (" ".join(f"{k}={v}" for k, v in settings_a.items()) or "default"),
+             "B " + (" ".join(f"{k}={v}" for k, v in settings_b.items()) or "default"))
+    pgn_file = open(pgn_path, "w") if pgn_path else None
+    start = time.time()
+    try:
+        with ProcessPoolExecutor(processes) as executor:
+            futures = {}
+            for game_index in range(games):
+                a_is_white = game_index % 2 == 0
+                white, black = (settings_a, settings_b) if a_is_white else (settings_b, settings_a)
+                futures[executor.submit(playGame, game_index, white, black, nodes_per_move)] = game_index
+            for future in as_completed(futures):
+                try:
+                    game_index, result, termination, san_moves = future.result()
+                except Exception as error:
+                    print(f"game {futures[future] + 1:>5} failed: {error!r}", flush=True)
+                    continue
+                a_is_white = game_index % 2 == 0
+                if result == "1/2-1/2":
+                    draws += 1
+                elif (result == "1-0") == a_is_white:
+                    wins += 1
+                else:
+                    losses += 1
+                white, black = names if a_is_white else names[::-1]
+                if pgn_file is not None:
+                    pgn_file.write(formatPgn(game_index, white, black, result, termination, san_moves))
+                    pgn_file.flush()
+                played = wins + draws + losses
+                elo, low, high = eloDifference(wins, draws, losses)
+                interval = f"[{low:+.0f}, {high:+.0f}]" if low is not None else "[unknown]"
+                print(f"game {game_index + 1:>5} {result:<7} {termination:<21} "
+                      f"{played}/{games}  +{wins} ={draws} -{losses}  Elo {elo:+.0f} {interval}  "
+                      f"{time.time() - start:.0f}s", flush=True)
+    finally:
+        if pgn_file is not None:
+            pgn_file.close()
+    return wins, draws, losses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Self-play between two ChessAI configurations.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=None, help="default: one per core")
+    parser.add_argument("--nodes", type=int, default=NODES_PER_MOVE, help="search nodes per move")
+    parser.add_argument("--a", nargs="*", default=[], metavar="SETTING=VALUE", help="ChessAI settings of A")
+    parser.add_argument("--b", nargs="*", default=[], metavar="SETTING=VALUE", help="ChessAI settings of B")
+    parser.add_argument("--pgn", default="tournament.pgn", help="file the games are written to")
+    arguments = parser.parse_args()
+    runTournament(arguments.games, arguments.processes, parseSettings(arguments.a), parseSettings(arguments.b),
+                  arguments.nodes, arguments.pgn)
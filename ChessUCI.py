@@ -0,0 +1,231 @@
+"""
+UCI (Universal Chess Interface) front end, so tournament managers and GUIs can run the engine without pygame:
+python ChessUCI.py
+Supported: uci, isready, setoption (Threads, Hash, OwnBook), ucinewgame, position startpos|fen ... [moves ...],
+go [depth|nodes|movetime|wtime|btime|winc|binc|movestogo|infinite|ponder], ponderhit, stop and quit.
+"""
+import sys
+import threading
+import time
+from queue import Queue
+
+import ChessAI
+import ChessBook
+import ChessEngine
+import ChessParallel
+
+ENGINE_NAME = "Chess-Engine"
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+DEFAULT_MOVES_TO_GO = 30  # the clock is shared out as if this many moves were left
+MOVE_OVERHEAD = 0.05  # seconds kept back for the answer to reach the GUI
+
+
+def findUciMove(game_state, text):
+    """
+    The valid move in UCI notation (e2e4, e7e8q), None if there is none.
+    """
+    for move in game_state.getValidMoves():
+        if move.getUciNotation() == text:
+            return move
+    return None
+
+
+def timeForMove(time_left, increment=0, moves_to_go=None):
+    """
+    Seconds to spend on a move with time_left on the clock.
+    """
+    budget = time_left / (moves_to_go or DEFAULT_MOVES_TO_GO) + increment * 0.8
+    return max(min(budget, time_left / 2) - MOVE_OVERHEAD, 0.01)
+
+
+class UciEngine:
+    """
+    Keeps the position and the running search, handle() takes one line of input.
+    The search runs in a thread so stop and quit are read while it runs.
+    """
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.game_state = ChessEngine.GameState()
+        self.search_thread = None
+        self.stop_requested = threading.Event()
+        self.own_book = True  # play moves from ChessBook.BOOK_FILE when the position is in it
+        self.search_started = threading.Event()  # set once the search has set up its deadline, or answered
+        self.ponder_time_limit = None  # the time limit of a go ponder, it starts with the ponderhit
+
+    def send(self, line):
+        self.output.write(line + "\n")
+        self.output.flush()
+
+    def handle(self, line):
+        """
+        Execute one command, returns False after quit.
+        """
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("id author Chess-Engine contributors")
+            self.send(f"option name Threads type spin default {ChessAI.THREADS} min 1 max 64")
+            self.send(f"option name Hash type spin default {ChessAI.TT_SIZE_MB} min 1 max 4096")
+            self.send("option name OwnBook type check default true")
+            self.send("option name Ponder type check default true")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.setOption(args)
+        elif command == "ucinewgame":
+            self.stop()
+            self.game_state = ChessEngine.GameState()
+            ChessParallel.newGame()
+        elif command == "position":
+            self.stop()
+            self.setPosition(args)
+        elif command == "go":
+            self.stop()
+            self.go(args)
+        elif command == "ponderhit":
+            self.ponderHit()
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        return True
+
+    def setOption(self, args):
+        if "name" not in args or "value" not in args:
+            return
+        name = " ".join(args[args.index("name") + 1:args.index("value")]).lower()
+        value = " ".join(args[args.index("value") + 1:])
+        if name == "threads":
+            ChessAI.THREADS = max(1, int(value))
+            ChessParallel.startSearchProcesses()
+        elif name == "hash":  # the table of this process, every search process of a parallel search has its own
+            ChessAI.transposition_table = ChessAI.TranspositionTable(max(1, int(value)))
+        elif name == "ownbook":
+            self.own_book = value.lower() == "true"
+
+    def setPosition(self, args):
+        if args and args[0] == "fen":
+            end = args.index("moves") if "moves" in args else len(args)
+            game_state = ChessEngine.GameState(" ".join(args[1:end]))
+        else:
+            game_state = ChessEngine.GameState(START_FEN)
+        if "moves" in args:
+            for text in args[args.index("moves") + 1:]:
+                move = findUciMove(game_state, text)
+                if move is None:
+                    self.send(f"info string illegal move {text}")
+                    break
+                game_state.makeMove(move)
+        self.game_state = game_state
+
+    def go(self, args):
+        limits = {}
+        for i, word in enumerate(args[:-1]):
+            if word in ("depth", "nodes", "movetime", "wtime", "btime", "winc", "binc", "movestogo"):
+                limits[word] = int(args[i + 1])
+        infinite = "infinite" in args
+        pondering = "ponder" in args
+        time_limit = max_depth = None
+        if "movetime" in limits:
+            time_limit = max(limits["movetime"] / 1000 - MOVE_OVERHEAD, 0.01)
+        elif ("wtime" if self.game_state.white_to_move else "btime") in limits:
+            side = "w" if self.game_state.white_to_move else "b"
+            time_limit = timeForMove(limits[side + "time"] / 1000, limits.get(side + "inc", 0) / 1000,
+                                     limits.get("movestogo"))
+        max_depth = limits.get("depth", ChessAI.MAX_DEPTH)
+        self.ponder_time_limit = time_limit if pondering else None
+        if infinite or pondering:  # a ponder search gets its time limit with the ponderhit
+            time_limit = None
+        if infinite:
+            max_depth = ChessAI.MAX_DEPTH
+        self.stop_requested.clear()
+        ChessParallel.startSearchProcesses()  # from this thread, never from the search thread (see there)
+        self.search_started.clear()
+        self.search_thread = threading.Thread(target=self.search,
+                                              args=(time_limit, max_depth, limits.get("nodes"), infinite or pondering),
+                                              daemon=True)
+        self.search_thread.start()
+
+    def search(self, time_limit, max_depth, node_limit, wait_for_stop):
+        """
+        Runs in the search thread and always answers with a bestmove, a legal one whenever there is one.
+        """
+        best_move = None
+        principal_variation = []
+        try:
+            best_move = ChessBook.bookMove(self.game_state) if self.own_book else None
+            if best_move is not None:
+                principal_variation = [best_move]
+                self.send("info string book move")
+            else:
+                return_queue = Queue()
+                principal_variation = ChessParallel.findBestMove(self.game_state, self.game_state.getValidMoves(),
+                                                                 return_queue, time_limit, max_depth, node_limit,
+                                                                 report=self.sendInfo)
+                best_move = return_queue.get()
+        except Exception as error:  # the GUI waits for the bestmove, it still gets one
+            self.send(f"info string search failed: {error!r}")
+        self.search_started.set()  # also after a book move or a failed search, a ponderhit mustn't wait for it
+        if best_move is None:  # the search kept no move, any legal move is better than 0000
+            valid_moves = self.game_state.getValidMoves()
+            best_move = valid_moves[0] if valid_moves else None
+            principal_variation = valid_moves[:1]
+        if wait_for_stop:
+            self.stop_requested.wait()  # an infinite or ponder search only answers after stop or ponderhit
+        if best_move is None:
+            self.send("bestmove 0000")
+        elif len(principal_variation) >= 2:
+            self.send(f"bestmove {best_move.getUciNotation()} ponder {principal_variation[1].getUciNotation()}")
+        else:
+            self.send(f"bestmove {best_move.getUciNotation()}")
+
+    def sendInfo(self, depth, score, nodes, seconds, principal_variation):
+        self.search_started.set()  # a report comes after the search has set up its deadline
+        if abs(score) >= ChessAI.CHECKMATE:  # mate at the end of the principal variation
+            moves_to_mate = (len(principal_variation) + 1) // 2
+            score_text = f"mate {moves_to_mate if score > 0 else -moves_to_mate}"
+        else:
+            score_text = f"cp {round(score * 100)}"
+        line = " ".join(move.getUciNotation() for move in principal_variation)
+        self.send(f"info depth {depth} score {score_text} nodes {nodes} nps {int(nodes / max(seconds, 1e-6))} "
+                  f"time {int(seconds * 1000)} pv {line}")
+
+    def ponderHit(self):
+        """
+        The opponent played the move the engine pondered on: the search goes on as a normal search whose time
+        starts now, and answers when it is done.
+        """
+        if self.search_thread is None:
+            return
+        self.search_started.wait()  # before it has started, the search would overwrite the new deadline
+        if self.ponder_time_limit is not None:
+            ChessAI.stopSearch(time.time() + self.ponder_time_limit)
+        self.stop_requested.set()
+
+    def stop(self):
+        """
+        Stop a running search, it still sends its bestmove.
+        """
+        if self.search_thread is not None:
+            self.stop_requested.set()
+            while self.search_thread.is_alive():
+                ChessAI.stopSearch()  # repeated, the search may not have set up its own deadline yet
+                self.search_thread.join(0.01)
+            self.search_thread = None
+
+
+def main():
+    engine = UciEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+The engine in a process of its own that lives as long as the game, so the GUI stays responsive while it thinks.
+The worker keeps its own GameState, transposition table and move ordering tables between moves and only hears
+about the moves played. Commands go over a pipe as tuples:
+("newgame", fen)  ("move", move_id)  ("undo",)  ("go", time_limit, max_depth)  ("ponder",)  ("stop",)  ("quit",)
+Every go is answered with exactly one ("bestmove", move_id), move_id is 0 when there is no move.
+After its own move the engine can ponder: it plays the reply its last search expected and searches on while the
+opponent thinks. If the opponent plays that move, the next go carries on with that search, otherwise the search is
+thrown away, only what it left in the transposition table is kept.
+Positions in the opening book (ChessBook.BOOK_FILE) are answered from the book without a search.
+"""
+import atexit
+import threading
+import time
+from multiprocessing import Pipe, Process
+from queue import Queue
+
+import ChessAI
+import ChessBook
+import ChessEngine
+import ChessParallel
+
+PONDER_MAX_DEPTH = ChessAI.MAX_DEPTH
+
+
+class SearchThread(threading.Thread):
+    """
+    One search of the worker. It sends its best move when it is done, a ponder search only once an answer is
+    requested.
+    """
+
+    def __init__(self, game_state, time_limit, max_depth, connection, answer=True):
+        super().__init__(daemon=True)
+        self.game_state = game_state
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.connection = connection
+        self.answer = answer
+        self.created = time.time()
+        self.lock = threading.Lock()
+        self.best_move_id = None  # set once the search is done
+        self.principal_variation = []  # moveIDs
+
+    def run(self):
+        best_move = None
+        principal_variation = []
+        try:
+            best_move = ChessBook.bookMove(self.game_state)
+            if best_move is not None:
+                principal_variation = [best_move]
+            else:
+                return_queue = Queue()
+                principal_variation = ChessParallel.findBestMove(self.game_state, self.game_state.getValidMoves(),
+                                                                 return_queue, self.time_limit, self.max_depth)
+                best_move = return_queue.get()
+        finally:  # the GUI waits for an answer, it gets one even when the search fails
+            if best_move is None:
+                valid_moves = self.game_state.getValidMoves()
+                best_move = valid_moves[0] if valid_moves else None
+            with self.lock:
+                self.principal_variation = [move.moveID for move in principal_variation]
+                self.best_move_id = best_move.moveID if best_move is not None else 0
+                if self.answer:
+                    self.connection.send(("bestmove", self.best_move_id))
+
+    def requestAnswer(self):
+        with self.lock:
+            self.answer = True
+            if self.best_move_id is not None:  # already done
+                self.connection.send(("bestmove", self.best_move_id))
+
+    def stop(self):
+        while self.is_alive():
+            ChessAI.stopSearch()  # repeated, the search may not have set up its own deadline yet
+            self.join(0.01)
+
+
+def engineWorker(connection):
+    """
+    Main loop of the worker process. The search runs in a thread, that way a stop can arrive while it runs.
+    Any command stops a running search first, the search answers with the best move it has so far.
+    """
+    game_state = ChessEngine.GameState()
+    search_thread = None
+    ponder_move_id = None  # the expected reply while pondering, it has been played on game_state
+    principal_variation = []  # of the last search that answered
+    while True:
+        try:
+            command, *args = connection.recv()
+        except EOFError:
+            break  # the GUI is gone
+        if ponder_move_id is not None:
+            if command == "move" and args[0] == ponder_move_id:
+                ponder_move_id = None  # ponder hit, the search goes on, now in the real position
+                continue
+            search_thread.stop()  # ponder miss, or anything else: the ponder search is worthless now
+            search_thread = None
+            game_state.undoMove()
+            ponder_move_id = None
+        if command == "go" and search_thread is not None and not search_thread.answer:
+            # go after a ponder hit, the pondering counts as thinking time
+            time_limit = args[0]
+            while search_thread.is_alive() and ChessAI.search_start_time < search_thread.created:
+                search_thread.join(0.001)  # the search hasn't started, it would overwrite the deadline
+            if time_limit is not None:
+                ChessAI.stopSearch(ChessAI.search_start_time + time_limit)
+            search_thread.requestAnswer()
+            continue
+        if search_thread is not None:
+            search_thread.stop()
+            if search_thread.answer:
+                principal_variation = search_thread.principal_variation
+            search_thread = None
+        if command == "go":
+            search_thread = SearchThread(game_state, *args, connection)
+            search_thread.start()
+        elif command == "ponder":
+            last_move = game_state.move_log[-1] if game_state.undo_stack else None
+            if len(principal_variation) >= 2 and last_move is not None and last_move.moveID == principal_variation[0]:
+                ponder_move_id = principal_variation[1]
+                game_state.makeMove(ChessEngine.Move.fromID(ponder_move_id, game_state.board))
+                search_thread = SearchThread(game_state, None, PONDER_MAX_DEPTH, connection, answer=False)
+                search_thread.start()
+        elif command == "move":
+            game_state.makeMove(ChessEngine.Move.fromID(args[0], game_state.board))
+        elif command == "undo":
+            game_state.undoMove()
+        elif command == "newgame":
+            game_state = ChessEngine.GameState(*args)
+            ChessParallel.newGame()
+        elif command == "quit":
+            break
+
+
+class EngineProcess:
+    """
+    Starts the worker and talks to it, mirror every change to the game with newGame, makeMove and undoMove.
+    """
+
+    def __init__(self):
+        self.connection, worker_connection = Pipe()
+        # not a daemon, those can't start the processes of a parallel search, so it has to be told to quit
+        self.process = Process(target=engineWorker, args=(worker_connection,))
+        self.process.start()
+        self.searching = False
+        atexit.register(self.quit)
+
+    def newGame(self, fen=None):
+        self.stop()
+        self.connection.send(("newgame", fen))
+
+    def makeMove(self, move):
+        self.stop()
+        self.connection.send(("move", move.moveID))
+
+    def undoMove(self):
+        self.stop()
+        self.connection.send(("undo",))
+
+    def ponder(self):
+        """
+        Search on the opponent's time, call it right after sending the engine's own move.
+        """
+        self.connection.send(("ponder",))
+
+    def go(self, time_limit=ChessAI.TIME_LIMIT, max_depth=ChessAI.MAX_DEPTH):
+        """
+        Start searching the current position, poll for the result.
+        """
+        self.stop()
+        self.connection.send(("go", time_limit, max_depth))
+        self.searching = True
+
+    def poll(self):
+        """
+        The moveID the search found once it is done (0 if there was no move), None while it is still running.
+        """
+        if not self.searching or not self.connection.poll():
+            return None
+        self.searching = False
+        return self.connection.recv()[1]
+
+    def stop(self):
+        """
+        Stop a running search and throw its answer away.
+        """
+        if self.searching:
+            self.connection.send(("stop",))
+            self.connection.recv()
+            self.searching = False
+
+    def quit(self):
+        if self.process.is_alive():
+            self.stop()
+            self.connection.send(("quit",))
+            self.process.join()